@@ -0,0 +1,53 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "ALTER TABLE submissions ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+            "(to_tsvector('simple', coalesce(full_name, '') || ' ' || coalesce(email, ''))) STORED"
+        )
+        op.create_index('ix_submissions_search_vector', 'submissions', ['search_vector'], postgresql_using='gin')
+        op.create_index('ix_submissions_full_name_trgm', 'submissions', ['full_name'], postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'})
+        op.create_index('ix_submissions_email_trgm', 'submissions', ['email'], postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'})
+    elif bind.dialect.name == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE submissions_fts USING fts5("
+            "full_name, email, content='submissions', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            "CREATE TRIGGER submissions_fts_ai AFTER INSERT ON submissions BEGIN "
+            "INSERT INTO submissions_fts(rowid, full_name, email) VALUES (new.id, new.full_name, new.email); END"
+        )
+        op.execute(
+            "CREATE TRIGGER submissions_fts_ad AFTER DELETE ON submissions BEGIN "
+            "INSERT INTO submissions_fts(submissions_fts, rowid, full_name, email) VALUES ('delete', old.id, old.full_name, old.email); END"
+        )
+        op.execute(
+            "CREATE TRIGGER submissions_fts_au AFTER UPDATE OF full_name, email ON submissions BEGIN "
+            "INSERT INTO submissions_fts(submissions_fts, rowid, full_name, email) VALUES ('delete', old.id, old.full_name, old.email); "
+            "INSERT INTO submissions_fts(rowid, full_name, email) VALUES (new.id, new.full_name, new.email); END"
+        )
+        # Index the rows that already exist
+        op.execute("INSERT INTO submissions_fts(submissions_fts) VALUES ('rebuild')")
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.drop_index('ix_submissions_email_trgm', table_name='submissions')
+        op.drop_index('ix_submissions_full_name_trgm', table_name='submissions')
+        op.drop_index('ix_submissions_search_vector', table_name='submissions')
+        op.drop_column('submissions', 'search_vector')
+    elif bind.dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS submissions_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS submissions_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS submissions_fts_ai")
+        op.execute("DROP TABLE IF EXISTS submissions_fts")
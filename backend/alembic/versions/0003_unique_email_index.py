@@ -0,0 +1,17 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# 0001 created submissions without the unique index the model declares on email.
+# Writes rely on it for INSERT ... ON CONFLICT (email) and to reject duplicate
+# emails on UPDATE. Remove existing duplicates before upgrading.
+def upgrade():
+    op.create_index('ix_submissions_email', 'submissions', ['email'], unique=True, if_not_exists=True)
+
+def downgrade():
+    op.drop_index('ix_submissions_email', table_name='submissions')
@@ -0,0 +1,23 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'submission_daily_stats',
+        sa.Column('day', sa.Date, primary_key=True),
+        sa.Column('submission_count', sa.Integer, nullable=False, server_default='0'),
+    )
+    # Seed from the existing rows; crud keeps the counts current from here on
+    op.execute(
+        "INSERT INTO submission_daily_stats (day, submission_count) "
+        "SELECT date(created_at), count(*) FROM submissions GROUP BY date(created_at)"
+    )
+
+def downgrade():
+    op.drop_table('submission_daily_stats')
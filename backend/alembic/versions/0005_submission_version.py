@@ -0,0 +1,16 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Bumped by every update; PUT with If-Match only applies to the version the client read.
+    # A constant default makes this a catalog-only change on PostgreSQL 11+ (no table rewrite).
+    op.add_column('submissions', sa.Column('version', sa.Integer, nullable=False, server_default='1'))
+
+def downgrade():
+    op.drop_column('submissions', 'version')
@@ -0,0 +1,35 @@
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+# Composite indexes for the list filters and sorts, matching Submission.__table_args__.
+# (name, columns, covering columns on PostgreSQL)
+INDEXES = [
+    ('ix_submissions_created_at_id', ['created_at', 'id'], ['full_name', 'email']),
+    ('ix_submissions_contact_created_at', ['preferred_contact', 'created_at', 'id'], []),
+    ('ix_submissions_age_created_at', ['age', 'created_at', 'id'], []),
+]
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # CONCURRENTLY keeps the table writable while the indexes build, but cannot run
+        # inside a transaction. If a build fails it leaves an INVALID index: drop it and rerun.
+        with op.get_context().autocommit_block():
+            for name, columns, include in INDEXES:
+                op.create_index(name, 'submissions', columns, postgresql_include=include, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, columns, _ in INDEXES:
+            op.create_index(name, 'submissions', columns, if_not_exists=True)
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, _, _ in INDEXES:
+                op.drop_index(name, table_name='submissions', postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, _, _ in INDEXES:
+            op.drop_index(name, table_name='submissions', if_exists=True)
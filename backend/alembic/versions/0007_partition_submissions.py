@@ -0,0 +1,149 @@
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+# PostgreSQL 13+ only; SQLite keeps the plain table.
+#
+# Rebuilds submissions as a table range-partitioned by created_at month. A unique index on a
+# partitioned table has to include the partition key, so email uniqueness moves to the
+# submission_emails registry, kept by triggers: a duplicate INSERT is skipped (the trigger
+# returns NULL, like ON CONFLICT DO NOTHING) and a duplicate email UPDATE raises
+# unique_violation. Set SUBMISSIONS_PARTITIONED=true once this has run so crud stops using
+# ON CONFLICT (email).
+#
+# The copy holds an ACCESS EXCLUSIVE lock on submissions for its duration; run it in a
+# maintenance window on large tables.
+
+COLUMNS = "id, full_name, email, phone_number, age, address, preferred_contact, created_at, updated_at, version"
+
+def create_table_sql(name, partitioned):
+    return f"""
+        CREATE TABLE {name} (
+            id integer NOT NULL DEFAULT nextval('submissions_id_seq'),
+            full_name varchar(255) NOT NULL,
+            email varchar(255) NOT NULL,
+            phone_number varchar(20) NOT NULL,
+            age integer NOT NULL,
+            address text,
+            preferred_contact varchar(20) NOT NULL,
+            created_at timestamp NOT NULL DEFAULT now(),
+            updated_at timestamp NOT NULL DEFAULT now(),
+            version integer NOT NULL DEFAULT 1,
+            search_vector tsvector GENERATED ALWAYS AS
+                (to_tsvector('simple', coalesce(full_name, '') || ' ' || coalesce(email, ''))) STORED,
+            CONSTRAINT age_range CHECK (age >= 18 AND age <= 120),
+            CONSTRAINT preferred_contact_check CHECK (preferred_contact IN ('Email', 'Phone', 'Both')),
+            PRIMARY KEY ({'id, created_at' if partitioned else 'id'})
+        ){' PARTITION BY RANGE (created_at)' if partitioned else ''}
+    """
+
+def create_indexes():
+    # Same set as 0002 and 0006; on the partitioned parent they cascade to every partition
+    op.create_index('ix_submissions_search_vector', 'submissions', ['search_vector'], postgresql_using='gin')
+    op.create_index('ix_submissions_full_name_trgm', 'submissions', ['full_name'], postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'})
+    op.create_index('ix_submissions_email_trgm', 'submissions', ['email'], postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'})
+    op.create_index('ix_submissions_created_at_id', 'submissions', ['created_at', 'id'], postgresql_include=['full_name', 'email'])
+    op.create_index('ix_submissions_contact_created_at', 'submissions', ['preferred_contact', 'created_at', 'id'])
+    op.create_index('ix_submissions_age_created_at', 'submissions', ['age', 'created_at', 'id'])
+
+def swap_tables(new_name, new_pkey):
+    # The id sequence is owned by the old table; detach it so dropping that table keeps it
+    op.execute("ALTER SEQUENCE submissions_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE submissions")
+    op.execute(f"ALTER TABLE {new_name} RENAME TO submissions")
+    op.execute(f"ALTER INDEX {new_pkey} RENAME TO submissions_pkey")
+    op.execute("ALTER SEQUENCE submissions_id_seq OWNED BY submissions.id")
+    create_indexes()
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("LOCK TABLE submissions IN ACCESS EXCLUSIVE MODE")
+    op.execute(create_table_sql("submissions_partitioned", partitioned=True))
+    op.execute("CREATE TABLE submissions_default PARTITION OF submissions_partitioned DEFAULT")
+
+    # One partition per month from the oldest row through PARTITION_MONTHS_AHEAD months from
+    # now; python -m src.partitions ensure (run on a schedule) keeps creating the next ones.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION ensure_submission_partitions(months_ahead integer DEFAULT 3, from_month date DEFAULT NULL)
+        RETURNS SETOF text LANGUAGE plpgsql AS $$
+        DECLARE
+            parent regclass := coalesce(to_regclass('submissions_partitioned'), 'submissions'::regclass);
+            cur_month date := date_trunc('month', coalesce(from_month, now()))::date;
+            last_month date := (date_trunc('month', now()) + make_interval(months => months_ahead))::date;
+            part_name text;
+        BEGIN
+            WHILE cur_month <= last_month LOOP
+                part_name := format('submissions_y%sm%s', to_char(cur_month, 'YYYY'), to_char(cur_month, 'MM'));
+                IF to_regclass(part_name) IS NULL THEN
+                    EXECUTE format('CREATE TABLE %I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                                   part_name, parent, cur_month, (cur_month + interval '1 month')::date);
+                    RETURN NEXT part_name;
+                END IF;
+                cur_month := (cur_month + interval '1 month')::date;
+            END LOOP;
+        END $$
+    """)
+    op.execute("SELECT ensure_submission_partitions(3, (SELECT min(created_at)::date FROM submissions))")
+
+    op.execute(f"INSERT INTO submissions_partitioned ({COLUMNS}) SELECT {COLUMNS} FROM submissions")
+    op.execute("""
+        CREATE TABLE submission_emails (
+            email varchar(255) PRIMARY KEY,
+            submission_id integer NOT NULL
+        )
+    """)
+    op.execute("INSERT INTO submission_emails (email, submission_id) SELECT email, id FROM submissions")
+    swap_tables("submissions_partitioned", "submissions_partitioned_pkey")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION submissions_register_email() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO submission_emails (email, submission_id) VALUES (NEW.email, NEW.id)
+                ON CONFLICT (email) DO NOTHING;
+                IF NOT FOUND THEN
+                    -- Email taken: skip this row, as INSERT ... ON CONFLICT DO NOTHING would
+                    RETURN NULL;
+                END IF;
+            ELSIF NEW.email IS DISTINCT FROM OLD.email THEN
+                -- Raises unique_violation when the new email belongs to another submission
+                INSERT INTO submission_emails (email, submission_id) VALUES (NEW.email, NEW.id);
+                DELETE FROM submission_emails WHERE email = OLD.email;
+            END IF;
+            RETURN NEW;
+        END $$
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION submissions_unregister_email() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            DELETE FROM submission_emails WHERE email = OLD.email AND submission_id = OLD.id;
+            RETURN NULL;
+        END $$
+    """)
+    op.execute(
+        "CREATE TRIGGER submissions_email_registry BEFORE INSERT OR UPDATE OF email ON submissions "
+        "FOR EACH ROW EXECUTE FUNCTION submissions_register_email()"
+    )
+    op.execute(
+        "CREATE TRIGGER submissions_email_unregister AFTER DELETE ON submissions "
+        "FOR EACH ROW EXECUTE FUNCTION submissions_unregister_email()"
+    )
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("LOCK TABLE submissions IN ACCESS EXCLUSIVE MODE")
+    op.execute(create_table_sql("submissions_plain", partitioned=False))
+    op.execute(f"INSERT INTO submissions_plain ({COLUMNS}) SELECT {COLUMNS} FROM submissions")
+    # Dropping the partitioned parent drops its partitions and triggers with it
+    swap_tables("submissions_plain", "submissions_plain_pkey")
+    op.create_index('ix_submissions_email', 'submissions', ['email'], unique=True)
+    op.execute("DROP TABLE submission_emails")
+    op.execute("DROP FUNCTION submissions_register_email()")
+    op.execute("DROP FUNCTION submissions_unregister_email()")
+    op.execute("DROP FUNCTION ensure_submission_partitions(integer, date)")
@@ -0,0 +1,30 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Manifest for python -m src.archive: where each archived batch lives and what it covers
+    op.create_table(
+        'submission_archives',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('object_key', sa.String(512), nullable=False, unique=True),
+        sa.Column('row_count', sa.Integer, nullable=False),
+        sa.Column('byte_size', sa.BigInteger, nullable=False),
+        sa.Column('sha256', sa.String(64), nullable=False),
+        sa.Column('first_id', sa.Integer, nullable=False),
+        sa.Column('last_id', sa.Integer, nullable=False),
+        sa.Column('created_from', sa.TIMESTAMP, nullable=False),
+        sa.Column('created_to', sa.TIMESTAMP, nullable=False),
+        sa.Column('archived_at', sa.TIMESTAMP, server_default=sa.func.now(), nullable=False),
+        sa.Column('rehydrated_at', sa.TIMESTAMP),
+    )
+    op.create_index('ix_submission_archives_created', 'submission_archives', ['created_from', 'created_to'])
+
+def downgrade():
+    op.drop_index('ix_submission_archives_created', table_name='submission_archives')
+    op.drop_table('submission_archives')
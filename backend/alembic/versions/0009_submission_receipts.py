@@ -0,0 +1,23 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Written by the queued-write consumer in the same transaction as the submissions it commits
+    op.create_table(
+        'submission_receipts',
+        sa.Column('id', sa.String(32), primary_key=True),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('submission_id', sa.Integer),
+        sa.Column('email', sa.String(255), nullable=False),
+        sa.Column('detail', sa.Text),
+        sa.Column('processed_at', sa.TIMESTAMP, server_default=sa.func.now(), nullable=False),
+    )
+
+def downgrade():
+    op.drop_table('submission_receipts')
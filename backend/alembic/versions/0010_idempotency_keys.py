@@ -0,0 +1,26 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Stored first responses for Idempotency-Key retries; rows past expires_at are reclaimed
+    op.create_table(
+        'idempotency_keys',
+        sa.Column('key', sa.String(255), primary_key=True),
+        sa.Column('request_hash', sa.String(64), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('response_status', sa.Integer),
+        sa.Column('response_headers', sa.Text),
+        sa.Column('response_body', sa.Text),
+        sa.Column('expires_at', sa.TIMESTAMP, nullable=False),
+    )
+    op.create_index('ix_idempotency_keys_expires_at', 'idempotency_keys', ['expires_at'])
+
+def downgrade():
+    op.drop_index('ix_idempotency_keys_expires_at', table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
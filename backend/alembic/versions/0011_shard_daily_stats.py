@@ -0,0 +1,42 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+# Splits each submission_daily_stats day over bucket rows (see rollups.ROLLUP_BUCKETS). The
+# primary key changes, so the table is rebuilt; existing counts land in bucket 0.
+
+def upgrade():
+    op.create_table(
+        'submission_daily_stats_new',
+        sa.Column('day', sa.Date, primary_key=True),
+        sa.Column('bucket', sa.SmallInteger, primary_key=True, server_default='0'),
+        sa.Column('submission_count', sa.Integer, nullable=False, server_default='0'),
+    )
+    op.execute(
+        "INSERT INTO submission_daily_stats_new (day, bucket, submission_count) "
+        "SELECT day, 0, submission_count FROM submission_daily_stats"
+    )
+    op.drop_table('submission_daily_stats')
+    op.rename_table('submission_daily_stats_new', 'submission_daily_stats')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("ALTER INDEX submission_daily_stats_new_pkey RENAME TO submission_daily_stats_pkey")
+
+def downgrade():
+    op.create_table(
+        'submission_daily_stats_old',
+        sa.Column('day', sa.Date, primary_key=True),
+        sa.Column('submission_count', sa.Integer, nullable=False, server_default='0'),
+    )
+    op.execute(
+        "INSERT INTO submission_daily_stats_old (day, submission_count) "
+        "SELECT day, sum(submission_count) FROM submission_daily_stats GROUP BY day"
+    )
+    op.drop_table('submission_daily_stats')
+    op.rename_table('submission_daily_stats_old', 'submission_daily_stats')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("ALTER INDEX submission_daily_stats_old_pkey RENAME TO submission_daily_stats_pkey")
@@ -0,0 +1,20 @@
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Rows loaded back by python -m src.archive rehydrate; later archive runs leave them alone
+    op.create_table(
+        'submission_rehydrations',
+        sa.Column('submission_id', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('archive_id', sa.Integer, sa.ForeignKey('submission_archives.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('rehydrated_at', sa.TIMESTAMP, server_default=sa.func.now(), nullable=False),
+    )
+
+def downgrade():
+    op.drop_table('submission_rehydrations')
@@ -0,0 +1,86 @@
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+# ensure_submission_partitions() from 0007 aborted as a whole once submissions_default held
+# rows for a month it was about to create (a server up past PARTITION_MONTHS_AHEAD, or rows
+# rehydrated into a detached month): CREATE TABLE ... PARTITION OF fails while the default
+# partition has matching rows. Now those rows are moved into the new partition, and a month
+# that still fails is skipped with a warning instead of rolling back the others.
+
+COLUMNS = "id, full_name, email, phone_number, age, address, preferred_contact, created_at, updated_at, version"
+
+ENSURE_SQL = f"""
+    CREATE OR REPLACE FUNCTION ensure_submission_partitions(months_ahead integer DEFAULT 3, from_month date DEFAULT NULL)
+    RETURNS SETOF text LANGUAGE plpgsql AS $$
+    DECLARE
+        parent regclass := coalesce(to_regclass('submissions_partitioned'), 'submissions'::regclass);
+        cur_month date := date_trunc('month', coalesce(from_month, now()))::date;
+        last_month date := (date_trunc('month', now()) + make_interval(months => months_ahead))::date;
+        next_month date;
+        part_name text;
+    BEGIN
+        WHILE cur_month <= last_month LOOP
+            part_name := format('submissions_y%sm%s', to_char(cur_month, 'YYYY'), to_char(cur_month, 'MM'));
+            next_month := (cur_month + interval '1 month')::date;
+            IF to_regclass(part_name) IS NULL THEN
+                BEGIN
+                    -- Take the month's rows out of the default partition, create the partition,
+                    -- and insert them again through the parent (the email triggers unregister
+                    -- and re-register them on the way)
+                    CREATE TEMP TABLE submissions_moving ON COMMIT DROP AS
+                        SELECT {COLUMNS} FROM submissions_default WITH NO DATA;
+                    WITH moved AS (
+                        DELETE FROM submissions_default
+                        WHERE created_at >= cur_month AND created_at < next_month
+                        RETURNING {COLUMNS}
+                    ) INSERT INTO submissions_moving SELECT * FROM moved;
+                    EXECUTE format('CREATE TABLE %I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                                   part_name, parent, cur_month, next_month);
+                    EXECUTE format('INSERT INTO %s ({COLUMNS}) SELECT {COLUMNS} FROM submissions_moving', parent);
+                    DROP TABLE submissions_moving;
+                    RETURN NEXT part_name;
+                EXCEPTION WHEN OTHERS THEN
+                    RAISE WARNING 'Skipped partition %: %', part_name, SQLERRM;
+                END;
+            END IF;
+            cur_month := next_month;
+        END LOOP;
+    END $$
+"""
+
+# As created by 0007
+PREVIOUS_SQL = """
+    CREATE OR REPLACE FUNCTION ensure_submission_partitions(months_ahead integer DEFAULT 3, from_month date DEFAULT NULL)
+    RETURNS SETOF text LANGUAGE plpgsql AS $$
+    DECLARE
+        parent regclass := coalesce(to_regclass('submissions_partitioned'), 'submissions'::regclass);
+        cur_month date := date_trunc('month', coalesce(from_month, now()))::date;
+        last_month date := (date_trunc('month', now()) + make_interval(months => months_ahead))::date;
+        part_name text;
+    BEGIN
+        WHILE cur_month <= last_month LOOP
+            part_name := format('submissions_y%sm%s', to_char(cur_month, 'YYYY'), to_char(cur_month, 'MM'));
+            IF to_regclass(part_name) IS NULL THEN
+                EXECUTE format('CREATE TABLE %I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                               part_name, parent, cur_month, (cur_month + interval '1 month')::date);
+                RETURN NEXT part_name;
+            END IF;
+            cur_month := (cur_month + interval '1 month')::date;
+        END LOOP;
+    END $$
+"""
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(ENSURE_SQL)
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(PREVIOUS_SQL)
@@ -0,0 +1,51 @@
+# Rows per second for importing submissions one POST at a time versus POST /bulk.
+# Uses a throwaway SQLite file unless DATABASE is set.
+#
+#   python benchmarks/bench_bulk_ingest.py [rows]
+import json
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fastapi.testclient import TestClient
+from src.main import app
+from src.database import Base, engine
+
+def payload(i, prefix):
+    return {
+        "full_name": "Bench User",
+        "email": f"{prefix}{i}@example.com",
+        "phone_number": "+1234567890",
+        "age": 30,
+        "address": "1 Bench St",
+        "preferred_contact": "Email",
+    }
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    Base.metadata.create_all(bind=engine)
+    client = TestClient(app)
+
+    start = time.perf_counter()
+    for i in range(n):
+        client.post("/api/submissions/", json=payload(i, "single"))
+    single = n / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    resp = client.post("/api/submissions/bulk", json=[payload(i, "array") for i in range(n)])
+    array = n / (time.perf_counter() - start)
+    assert resp.json()["created"] == n
+
+    body = "\n".join(json.dumps(payload(i, "ndjson")) for i in range(n))
+    start = time.perf_counter()
+    resp = client.post("/api/submissions/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    ndjson = n / (time.perf_counter() - start)
+    assert resp.json()["created"] == n
+
+    print(f"{'path':<16} {'rows/s':>10}")
+    print(f"{'POST /':<16} {single:>10.0f}")
+    print(f"{'bulk (array)':<16} {array:>10.0f}")
+    print(f"{'bulk (ndjson)':<16} {ndjson:>10.0f}")
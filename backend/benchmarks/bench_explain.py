@@ -0,0 +1,129 @@
+# EXPLAINs the SQL that GET /api/submissions/ issues (crud.get_submissions_json with the
+# route's defaults: the page query, the exact count, then the next cursor page) for each
+# list filter/sort combination over a seeded table, and fails if any of it scans
+# submissions sequentially. Counting an unfiltered table reads every row by definition;
+# that one is reported, not failed (count=estimate avoids it).
+# Uses a throwaway SQLite file unless DATABASE is set (point it at an empty PostgreSQL
+# database migrated with `alembic upgrade head` to check the production plans).
+#
+#   python benchmarks/bench_explain.py [rows]
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from sqlalchemy import event, insert, text
+from src import crud
+from src.database import Base, SessionLocal, engine, init_db
+from src.models import Submission
+
+FILTERS = {
+    "none": {},
+    "preferred_contact": {"preferred_contact": "Email"},
+    "age": {"age": 30},
+    "created range": {"created_from": "2024-03-01", "created_to": "2024-03-08"},
+    "contact + range": {"preferred_contact": "Phone", "created_from": "2024-03-01", "created_to": "2024-03-08"},
+    "age + range": {"age": 45, "created_from": "2024-03-01", "created_to": "2024-06-01"},
+    "search": {"search": "user1234"},
+}
+SORTS = {
+    "id desc": {},
+    "created_at desc": {"sort_by": "created_at", "sort_order": "desc"},
+    "created_at asc": {"sort_by": "created_at", "sort_order": "asc"},
+}
+
+def seed(n):
+    start = datetime(2024, 1, 1)
+    rows = [
+        {
+            "full_name": f"User {i}",
+            "email": f"user{i}@example.com",
+            "phone_number": "+1234567890",
+            "age": random.randint(18, 120),
+            "address": "1 Bench St " * 20,
+            "preferred_contact": random.choice(["Email", "Phone", "Both"]),
+            "created_at": start + timedelta(minutes=i),
+            "updated_at": start + timedelta(minutes=i),
+        }
+        for i in range(n)
+    ]
+    with engine.begin() as conn:
+        for i in range(0, n, 10000):
+            conn.execute(insert(Submission), rows[i:i + 10000])
+        conn.execute(text("ANALYZE"))
+
+def captured_selects(params):
+    # The statements a list request actually runs, with their parameters: everything
+    # get_submissions_json does on a cache miss, for the first page and the cursor page
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+    crud.clear_count_cache()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        with SessionLocal() as db:
+            _, body = crud.get_submissions_json(db, use_cache=False, **params)
+            next_cursor = json.loads(body)["next_cursor"]
+            if next_cursor:
+                crud.get_submissions_json(db, use_cache=False, cursor=next_cursor, **params)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+def full_count(statement, filters):
+    return not filters and statement.lstrip().upper().startswith("SELECT COUNT(")
+
+def sqlite_seq_scans(conn, statement, parameters):
+    plan = [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+    # A bare SCAN of the rowid table is a primary-key-order walk when the query is ordered by
+    # id and needs no sort, which LIMIT cuts short (PostgreSQL's Index Scan Backward on the pk)
+    pk_order = "ORDER BY submissions.id" in statement and not any("TEMP B-TREE" in step for step in plan)
+    bad = [step for step in plan if step == "SCAN submissions" and not pk_order]
+    return bad, plan
+
+def postgres_seq_scans(conn, statement, parameters):
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+    plan = plan if isinstance(plan, list) else json.loads(plan)
+    bad, nodes = [], [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") == "submissions":
+            bad.append(f"Seq Scan on submissions (filter: {node.get('Filter')})")
+        nodes.extend(node.get("Plans", []))
+    return bad, plan
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    init_db()
+    start = time.perf_counter()
+    seed(n)
+    print(f"seeded {n} rows in {time.perf_counter() - start:.1f}s")
+    check = postgres_seq_scans if engine.dialect.name == "postgresql" else sqlite_seq_scans
+
+    failures = []
+    print(f"{'filter':<18} {'sort':<16} {'queries':>7}  result")
+    for filter_name, filters in FILTERS.items():
+        for sort_name, sort in SORTS.items():
+            statements = captured_selects({**filters, **sort})
+            problems, notes = [], []
+            with engine.connect() as conn:
+                for statement, parameters in statements:
+                    bad, plan = check(conn, statement, parameters)
+                    if bad and full_count(statement, filters):
+                        notes.append("full count scans")
+                    elif bad:
+                        problems.append((statement, plan))
+            result = "SEQ SCAN" if problems else "ok"
+            print(f"{filter_name:<18} {sort_name:<16} {len(statements):>7}  {result}{' (' + ', '.join(notes) + ')' if notes else ''}")
+            failures.extend((filter_name, sort_name, statement, plan) for statement, plan in problems)
+
+    for filter_name, sort_name, statement, plan in failures:
+        print(f"\n{filter_name} / {sort_name}:\n{statement}\n{plan}")
+    Base.metadata.drop_all(bind=engine)
+    assert not failures, f"{len(failures)} queries scan submissions sequentially"
@@ -0,0 +1,51 @@
+# Import-time breakdown of src.main, i.e. the work a Lambda cold start pays before
+# the first request, for STARTUP_MODE=eager and lazy, plus the cost of the work that
+# is now deferred to first use. Every measurement runs in a fresh interpreter.
+#
+#   python benchmarks/bench_import.py [runs]
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+APP_MODULES = ["src.database", "src.models", "src.schemas", "src.auth", "src.crud", "src.routes", "src.main"]
+TIMED = "import time, sys; t = time.perf_counter(); {code}; print('WALL', (time.perf_counter() - t) * 1e6); print('LOADED', ','.join(m for m in ('boto3', 'bleach', 'passlib') if m in sys.modules))"
+DEFERRED = {
+    "import boto3 + 2 clients": "import boto3; boto3.client('s3', region_name='us-east-1'); boto3.client('ses', region_name='us-east-1')",
+    "import bleach": "import bleach",
+    "passlib + bcrypt hash": "from passlib.context import CryptContext; CryptContext(schemes=['bcrypt']).hash('testpass')",
+}
+
+def run(code, mode="lazy"):
+    env = {**os.environ, "STARTUP_MODE": mode, "DATABASE": f"sqlite:///{tempfile.mkdtemp()}/import.db"}
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", TIMED.format(code=code)], cwd=BACKEND, env=env, capture_output=True, text=True, check=True)
+    self_times, wall, loaded = {}, 0.0, ""
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            self_times[name.strip()] = int(own)
+    for line in proc.stdout.splitlines():
+        if line.startswith("WALL"):
+            wall = float(line.split()[1])
+        elif line.startswith("LOADED"):
+            loaded = line.partition(" ")[2]
+    return self_times, wall, loaded
+
+def best(code, mode, runs):
+    return min((run(code, mode) for _ in range(runs)), key=lambda sample: sample[1])
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    results = {mode: best("import src.main", mode, runs) for mode in ("eager", "lazy")}
+    print(f"{'self time (ms)':<26} {'eager':>9} {'lazy':>9}")
+    for name in APP_MODULES:
+        print(f"{name:<26} {results['eager'][0].get(name, 0) / 1000:>9.1f} {results['lazy'][0].get(name, 0) / 1000:>9.1f}")
+    print(f"{'import src.main (wall)':<26} {results['eager'][1] / 1000:>9.1f} {results['lazy'][1] / 1000:>9.1f}")
+    print(f"{'heavy modules loaded':<26} {results['eager'][2] or '-':>9} {results['lazy'][2] or '-':>9}")
+    print()
+    print(f"{'deferred to first use (ms)':<26} {'wall':>9}")
+    for label, code in DEFERRED.items():
+        print(f"{label:<26} {best(code, 'lazy', runs)[1] / 1000:>9.1f}")
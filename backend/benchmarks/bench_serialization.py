@@ -0,0 +1,67 @@
+# Compares per-row cost of serializing a list page:
+#   legacy        - output model inheriting SubmissionBase (re-runs bleach and regex validators),
+#                   dumped to a dict and json-encoded the way response_model does it
+#   response_model - current SubmissionOut through the same dict + json.dumps path
+#   direct        - schemas.submissions_page_json (validator-free model straight to JSON bytes)
+#
+#   python benchmarks/bench_serialization.py [rows] [rounds]
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pydantic import BaseModel
+from src import schemas
+from src.models import Submission
+
+class LegacySubmissionOut(schemas.SubmissionBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class LegacyPage(BaseModel):
+    total: int
+    items: List[LegacySubmissionOut]
+
+def make_rows(n):
+    now = datetime.utcnow()
+    return [
+        Submission(id=i, full_name="Test User", email=f"user{i}@example.com", phone_number="+1234567890", age=30,
+                   address="123 Test St", preferred_contact="Email", created_at=now, updated_at=now)
+        for i in range(n)
+    ]
+
+def legacy(rows):
+    page = LegacyPage.model_validate({"total": len(rows), "items": rows})
+    return json.dumps(page.model_dump(mode="json")).encode()
+
+def response_model(rows):
+    page = schemas.PaginatedSubmissions.model_validate({"total": len(rows), "items": rows})
+    return json.dumps(page.model_dump(mode="json")).encode()
+
+def direct(rows):
+    return schemas.submissions_page_json({"total": len(rows), "items": rows})
+
+def bench(fn, rows, rounds):
+    fn(rows)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(rows)
+    return (time.perf_counter() - start) / (rounds * len(rows)) * 1e6
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rows = make_rows(n)
+    assert json.loads(response_model(rows)) == json.loads(direct(rows))
+    baseline = bench(legacy, rows, rounds)
+    print(f"{'path':<15} {'us/row':>8} {'speedup':>8}")
+    for name, fn in [("legacy", legacy), ("response_model", response_model), ("direct", direct)]:
+        per_row = baseline if fn is legacy else bench(fn, rows, rounds)
+        print(f"{name:<15} {per_row:>8.2f} {baseline / per_row:>7.1f}x")
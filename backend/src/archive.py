@@ -0,0 +1,239 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from functools import lru_cache
+from sqlalchemy import select, delete, update, insert, exists
+from sqlalchemy.orm import Session
+from . import aws, crud, rollups, cache
+from .export import EXPORT_COLUMNS, encode_rows
+from .models import Submission, SubmissionArchive, SubmissionRehydration
+
+# Moves submissions older than ARCHIVE_AFTER_DAYS out of the hot table, ARCHIVE_BATCH_SIZE
+# rows per transaction, into gzip NDJSON objects recorded in submission_archives.
+# s3: ARCHIVE_BUCKET (default S3_BUCKET) under ARCHIVE_PREFIX. local: files under ARCHIVE_DIR.
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "5000"))
+ARCHIVE_BACKEND = os.getenv("ARCHIVE_BACKEND", "s3")
+ARCHIVE_BUCKET = os.getenv("ARCHIVE_BUCKET") or os.getenv("S3_BUCKET")
+ARCHIVE_PREFIX = os.getenv("ARCHIVE_PREFIX", "archive/submissions/")
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+# Rehydrated rows stay in the hot table this long, then archive normally again (into a new
+# object; the batch they came from stays marked rehydrated, so it is not read twice)
+REHYDRATE_RETENTION_DAYS = int(os.getenv("REHYDRATE_RETENTION_DAYS", "30"))
+# A scheduled Lambda run stops starting batches when less than this is left
+ARCHIVE_TIME_MARGIN_MS = int(os.getenv("ARCHIVE_TIME_MARGIN_MS", "10000"))
+
+manifest = SubmissionArchive.__table__
+rehydrations = SubmissionRehydration.__table__
+
+
+class LocalStore:
+    def __init__(self, root: str = ARCHIVE_DIR):
+        self.root = root
+
+    def put(self, key: str, data: bytes):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Never leave a half-written object under the final name
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def get(self, key: str) -> bytes:
+        with open(os.path.join(self.root, key), "rb") as f:
+            return f.read()
+
+
+class S3Store:
+    def __init__(self, bucket: str = ARCHIVE_BUCKET, client=None):
+        self.bucket = bucket
+        self.client = client
+
+    def put(self, key: str, data: bytes):
+        client = self.client or aws.get_client("s3")
+        client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType="application/x-ndjson", ContentEncoding="gzip")
+
+    def get(self, key: str) -> bytes:
+        client = self.client or aws.get_client("s3")
+        return client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+
+@lru_cache(maxsize=None)
+def get_store():
+    if ARCHIVE_BACKEND == "local":
+        return LocalStore()
+    return S3Store()
+
+def object_key(rows, archived_at: datetime = None) -> str:
+    # Grouped by the month of the oldest row; the id range keeps keys unique, plus the time
+    # for rows archived a second time after a rehydration
+    suffix = f"-{archived_at:%Y%m%d%H%M%S}" if archived_at else ""
+    return f"{ARCHIVE_PREFIX}{rows[0]['created_at']:%Y/%m}/{rows[0]['id']}-{rows[-1]['id']}{suffix}.ndjson.gz"
+
+def archive_batch(db: Session, store, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE, retention_days: int = REHYDRATE_RETENTION_DAYS):
+    # One batch in one short transaction: lock the oldest rows (skipping any a writer holds),
+    # upload them, record the manifest entry and delete them. The upload happens before the
+    # commit, so a failed commit can orphan an object but never lose rows. Rows rehydrated
+    # within retention_days keep their old created_at and are skipped, or every run would
+    # archive them straight back.
+    retained = exists().where(
+        rehydrations.c.submission_id == Submission.id,
+        rehydrations.c.rehydrated_at > datetime.utcnow() - timedelta(days=retention_days),
+    )
+    query = (
+        select(*Submission.__table__.columns)
+        .where(Submission.created_at < cutoff, ~retained)
+        .order_by(Submission.created_at, Submission.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    rows = db.execute(query).mappings().all()
+    if not rows:
+        db.rollback()
+        return None
+    data = gzip.compress(encode_rows(rows, "ndjson"), mtime=0)
+    key = object_key(rows)
+    if db.execute(select(manifest.c.id).where(manifest.c.object_key == key)).first() is not None:
+        # Never overwrite the object of the batch these rows were rehydrated from
+        key = object_key(rows, datetime.utcnow())
+    store.put(key, data)
+    entry = {
+        "object_key": key,
+        "row_count": len(rows),
+        "byte_size": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "first_id": min(row["id"] for row in rows),
+        "last_id": max(row["id"] for row in rows),
+        "created_from": rows[0]["created_at"],
+        "created_to": rows[-1]["created_at"],
+    }
+    db.execute(insert(manifest).values(**entry))
+    ids = [row["id"] for row in rows]
+    # The created_at bound lets a partitioned table prune to the old months
+    db.execute(delete(Submission).where(Submission.id.in_(ids), Submission.created_at < cutoff))
+    db.execute(delete(rehydrations).where(rehydrations.c.submission_id.in_(ids)))
+    rollups.bump_daily_stats(db, [row["created_at"] for row in rows], sign=-1)
+    db.commit()
+    crud.clear_count_cache()
+    cache.invalidate_submissions(ids)
+    return entry
+
+def archive_old_submissions(db: Session, store=None, older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE, max_batches: int = None, should_continue=None, retention_days: int = REHYDRATE_RETENTION_DAYS):
+    # Runs batches until nothing older than the cutoff is left, max_batches is reached or
+    # should_continue() says stop; returns the manifest entries written
+    store = store or get_store()
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    entries = []
+    while max_batches is None or len(entries) < max_batches:
+        if should_continue is not None and not should_continue():
+            break
+        entry = archive_batch(db, store, cutoff, batch_size, retention_days)
+        if entry is None:
+            break
+        print(f"Archived {entry['row_count']} rows to {entry['object_key']}")
+        entries.append(entry)
+    return entries
+
+def read_archive(store, object_key: str):
+    # Rows as dicts with real datetimes, ready to insert again
+    for line in gzip.decompress(store.get(object_key)).splitlines():
+        row = json.loads(line)
+        for column in ("created_at", "updated_at"):
+            row[column] = datetime.fromisoformat(row[column])
+        yield row
+
+def archives_between(db: Session, created_from: datetime = None, created_to: datetime = None):
+    # Manifest entries whose range overlaps [created_from, created_to] and are still archived
+    query = select(manifest).where(manifest.c.rehydrated_at.is_(None)).order_by(manifest.c.created_from)
+    if created_from:
+        query = query.where(manifest.c.created_to >= created_from)
+    if created_to:
+        query = query.where(manifest.c.created_from <= created_to)
+    return db.execute(query).mappings().all()
+
+def query_archive(db: Session, store=None, created_from: datetime = None, created_to: datetime = None):
+    # Reads archived rows on demand without loading them back into submissions
+    store = store or get_store()
+    for entry in archives_between(db, created_from, created_to):
+        for row in read_archive(store, entry["object_key"]):
+            if (created_from is None or row["created_at"] >= created_from) and (created_to is None or row["created_at"] <= created_to):
+                yield row
+
+def rehydrate(db: Session, archive_id: int, store=None):
+    # Loads one archived batch back into submissions with its original ids; rows whose
+    # email has since been submitted again are skipped. The rows, their
+    # submission_rehydrations records and the manifest's rehydrated_at commit together, so
+    # a crash part way leaves nothing half restored. Returns (restored, skipped).
+    store = store or get_store()
+    entry = db.execute(select(manifest).where(manifest.c.id == archive_id).with_for_update()).mappings().one_or_none()
+    if entry is None or entry["rehydrated_at"] is not None:
+        db.rollback()
+        return None
+    rows = list(read_archive(store, entry["object_key"]))
+    restored, now = 0, datetime.utcnow()
+    for i in range(0, len(rows), crud.BULK_BATCH_SIZE):
+        ids = crud.insert_submission_rows(db, rows[i:i + crud.BULK_BATCH_SIZE])
+        if ids:
+            db.execute(insert(rehydrations), [{"submission_id": submission_id, "archive_id": archive_id, "rehydrated_at": now} for submission_id in ids.values()])
+        restored += len(ids)
+    db.execute(update(manifest).where(manifest.c.id == archive_id).values(rehydrated_at=now))
+    db.commit()
+    if restored:
+        crud.clear_count_cache()
+        cache.invalidate_lists()
+    return restored, len(rows) - restored
+
+def run_scheduled(event: dict, context=None):
+    # EventBridge schedule target: {"task": "archive", "older_than_days": 90, "max_batches": 20}
+    from .database import SessionLocal
+    def should_continue():
+        return context is None or context.get_remaining_time_in_millis() > ARCHIVE_TIME_MARGIN_MS
+    with SessionLocal() as db:
+        entries = archive_old_submissions(
+            db,
+            older_than_days=int(event.get("older_than_days", ARCHIVE_AFTER_DAYS)),
+            batch_size=int(event.get("batch_size", ARCHIVE_BATCH_SIZE)),
+            max_batches=event.get("max_batches"),
+            should_continue=should_continue,
+        )
+    return {"batches": len(entries), "rows": sum(entry["row_count"] for entry in entries)}
+
+def main(argv=None):
+    from .database import SessionLocal
+    parser = argparse.ArgumentParser(description="Archive old submissions to object storage")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="Archive rows older than --older-than-days in batches")
+    run.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    run.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    run.add_argument("--max-batches", type=int)
+    listing = sub.add_parser("list", help="Show manifest entries")
+    query = sub.add_parser("query", help="Print archived rows in a created_at range as NDJSON")
+    for parser_ in (listing, query):
+        parser_.add_argument("--from", dest="start", type=datetime.fromisoformat)
+        parser_.add_argument("--to", dest="end", type=datetime.fromisoformat)
+    restore = sub.add_parser("rehydrate", help="Load one archived batch back into submissions")
+    restore.add_argument("archive_id", type=int)
+    args = parser.parse_args(argv)
+    with SessionLocal() as db:
+        if args.command == "run":
+            entries = archive_old_submissions(db, older_than_days=args.older_than_days, batch_size=args.batch_size, max_batches=args.max_batches)
+            print(f"Archived {sum(entry['row_count'] for entry in entries)} row(s) in {len(entries)} batch(es)")
+        elif args.command == "list":
+            for entry in archives_between(db, args.start, args.end):
+                print(f"{entry['id']:>6}  {entry['created_from']} .. {entry['created_to']}  {entry['row_count']:>7} rows  {entry['object_key']}")
+        elif args.command == "query":
+            for row in query_archive(db, created_from=args.start, created_to=args.end):
+                sys.stdout.write(json.dumps({column: row[column] for column in EXPORT_COLUMNS}, default=str) + "\n")
+        else:
+            result = rehydrate(db, args.archive_id)
+            if result is None:
+                print(f"No archived batch {args.archive_id}")
+            else:
+                print(f"Restored {result[0]} row(s), skipped {result[1]} duplicate email(s)")
+
+if __name__ == "__main__":
+    main()
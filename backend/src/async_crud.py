@@ -0,0 +1,46 @@
+from .deps import AnySession, run_db
+from . import crud, singleflight
+
+# Awaitable counterparts of the crud functions. They share one implementation:
+# on an AsyncSession the query runs on the async driver via run_sync, on a
+# sync Session it is pushed to the threadpool.
+#
+# The JSON reads go through singleflight.reads: identical concurrent requests share one
+# execution. Conditional requests (already a cheap probe) and read-your-writes clients
+# (use_cache False, they must not get a result that began before their write) run alone.
+
+async def get_submission(db: AnySession, submission_id: int):
+    return await run_db(db, crud.get_submission, submission_id)
+
+async def get_submissions(db: AnySession, **params):
+    return await run_db(db, crud.get_submissions, **params)
+
+async def get_submission_json(db: AnySession, submission_id: int, if_none_match: str = None, use_cache: bool = True, fields: tuple = None):
+    if if_none_match or not use_cache:
+        return await run_db(db, crud.get_submission_json, submission_id, if_none_match, use_cache, fields)
+    key = singleflight.key("submission", {"id": submission_id, "fields": fields})
+    return await singleflight.reads.ado(key, lambda: run_db(db, crud.get_submission_json, submission_id, None, use_cache, fields))
+
+async def get_submissions_json(db: AnySession, if_none_match: str = None, use_cache: bool = True, **params):
+    if if_none_match or not use_cache:
+        return await run_db(db, crud.get_submissions_json, if_none_match, use_cache, **params)
+    key = singleflight.key("submissions", params)
+    return await singleflight.reads.ado(key, lambda: run_db(db, crud.get_submissions_json, None, use_cache, **params))
+
+async def create_submission(db: AnySession, submission):
+    return await run_db(db, crud.create_submission, submission)
+
+async def update_submission(db: AnySession, submission_id: int, submission, if_match: str = None):
+    return await run_db(db, crud.update_submission, submission_id, submission, if_match)
+
+async def patch_submission(db: AnySession, submission_id: int, patch, if_match: str = None):
+    return await run_db(db, crud.patch_submission, submission_id, patch, if_match)
+
+async def delete_submission(db: AnySession, submission_id: int):
+    return await run_db(db, crud.delete_submission, submission_id)
+
+async def get_analytics(db: AnySession, start=None, end=None, use_cache: bool = True):
+    if not use_cache:
+        return await run_db(db, crud.get_analytics, start, end)
+    key = singleflight.key("analytics", {"start": start, "end": end})
+    return await singleflight.reads.ado(key, lambda: run_db(db, crud.get_analytics, start, end))
@@ -0,0 +1,17 @@
+import os
+from functools import lru_cache
+
+AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
+AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
+AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
+
+@lru_cache(maxsize=None)
+def get_client(service: str):
+    # boto3 is imported and clients are built on first use, not at cold start
+    import boto3
+    return boto3.client(
+        service,
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        region_name=AWS_REGION,
+    )
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from . import singleflight
+
+# none: off (default). redis: shared across workers/containers (REDIS_URL). memory: per-process
+# LRU with TTL, for a single worker only: a write invalidates nothing in other processes.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "none")
+CACHE_TTL = int(os.getenv("CACHE_TTL", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CACHE_PREFIX = os.getenv("CACHE_PREFIX", "formapp:")
+
+LIST_VERSION_KEY = "submissions:list-version"
+
+
+class MemoryCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: int = None):
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    # Any client speaking the redis-py API (get, set with ex=, scan_iter, delete) works, e.g. a fake in tests
+    def __init__(self, client, prefix: str = CACHE_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl: int = None):
+        self.client.set(self.prefix + key, value, ex=ttl or None)
+
+    def clear(self):
+        # Only ours: other apps may share the database
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl: int = None):
+        pass
+
+    def clear(self):
+        pass
+
+
+@lru_cache(maxsize=None)
+def get_cache():
+    if CACHE_BACKEND == "redis":
+        import redis
+        return RedisCache(redis.Redis.from_url(REDIS_URL, socket_timeout=0.5))
+    if CACHE_BACKEND == "memory":
+        if multiple_processes():
+            print("CACHE_BACKEND=memory cannot see other workers' writes; caching is off (use redis)")
+            return NullCache()
+        return MemoryCache()
+    return NullCache()
+
+def multiple_processes() -> bool:
+    # uvicorn/gunicorn read WEB_CONCURRENCY; every Lambda container is its own process
+    return int(os.getenv("WEB_CONCURRENCY", "1")) > 1 or bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
+
+# Keys embed a version token that writers replace after they commit. A reader that
+# fetched the old token before a write can only fill a key nobody reads any more,
+# so a slow read racing a write never leaves a stale entry behind. That only holds for
+# reads from the primary: a replica can serve the old row after the bump, so replica
+# reads use the cache but never fill it (crud.fills_cache).
+# Tokens outlive the entries they cover; losing one only starts a fresh namespace.
+VERSION_TTL = CACHE_TTL * 10
+
+def _version(version_key: str):
+    cache = get_cache()
+    try:
+        token = cache.get(version_key)
+        if token is None:
+            token = uuid.uuid4().hex
+            cache.set(version_key, token, VERSION_TTL)
+    except Exception as e:
+        # A cache outage degrades to database reads
+        print(f"Cache unavailable: {e}")
+        return None
+    return token.decode() if isinstance(token, bytes) else token
+
+def _bump(*version_keys: str):
+    # Every committed write comes through here, so single-flight grace results end with it
+    singleflight.reads.expire()
+    cache = get_cache()
+    try:
+        for version_key in version_keys:
+            cache.set(version_key, uuid.uuid4().hex, VERSION_TTL)
+    except Exception as e:
+        # The write is already committed; stale entries expire after CACHE_TTL
+        print(f"Cache invalidation failed: {e}")
+
+def submission_key(submission_id: int, fields: tuple = None):
+    # Every ?fields= projection of a row shares its version token, so one bump retires them all
+    version = _version(f"submission:{submission_id}:version")
+    if not version:
+        return None
+    return f"submission:{submission_id}:{version}" + (":" + ",".join(fields) if fields else "")
+
+def list_key(params: dict):
+    # Same filters in any order, with defaults spelled out or not, share an entry
+    version = _version(LIST_VERSION_KEY)
+    if not version:
+        return None
+    normalized = json.dumps({k: v for k, v in params.items() if v not in (None, "")}, sort_keys=True, default=str)
+    return f"submissions:{version}:{hashlib.sha1(normalized.encode()).hexdigest()}"
+
+def lookup(key):
+    if key is None:
+        return None
+    try:
+        return get_cache().get(key)
+    except Exception as e:
+        print(f"Cache get failed: {e}")
+        return None
+
+def store(key, value):
+    if key is None:
+        return
+    try:
+        get_cache().set(key, value, CACHE_TTL)
+    except Exception as e:
+        print(f"Cache set failed: {e}")
+
+def invalidate_submission(submission_id: int):
+    # One row changed: its own entry and every list page that might include it
+    _bump(f"submission:{submission_id}:version", LIST_VERSION_KEY)
+
+def invalidate_submissions(submission_ids):
+    # Batch deletes (archival): every row's token, and the list token once
+    _bump(*(f"submission:{submission_id}:version" for submission_id in submission_ids), LIST_VERSION_KEY)
+
+def invalidate_lists():
+    _bump(LIST_VERSION_KEY)
+
+def clear():
+    get_cache().clear()
@@ -1,20 +1,127 @@
 from sqlalchemy.future import select
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 from .models import Submission
-from .schemas import SubmissionCreate, SubmissionUpdate
-from sqlalchemy import or_, func, and_, desc, asc
+from .search import search_clause
+from . import rollups, cache, etags
+from .schemas import SubmissionCreate, SubmissionUpdate, SubmissionPatch, SubmissionOut, submission_json, submissions_page_json
+from sqlalchemy import or_, func, and_, desc, asc, text, insert, update, delete
+from sqlalchemy.dialects import postgresql, sqlite
 from fastapi import HTTPException
 from sqlalchemy.exc import IntegrityError
+from datetime import datetime, date
+import base64
+import json
+import os
+import time
 
-def get_submission(db: Session, submission_id: int):
-    result = db.execute(select(Submission).where(Submission.id == submission_id))
+PROJECTABLE_FIELDS = tuple(SubmissionOut.model_fields)
+
+def parse_fields(fields: str = None):
+    # ?fields=full_name,email -> ("id", "full_name", "email") in model order; None means every field
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(PROJECTABLE_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    requested.add("id")
+    return tuple(name for name in PROJECTABLE_FIELDS if name in requested)
+
+def projection(fields: tuple = None, *needed: str):
+    # Column-level SELECT for a projection: wide columns such as address are never read.
+    # `needed` adds columns the query itself uses (cursor key, version for the ETag);
+    # raiseload turns any accidental access to an unloaded column into an error, not a query.
+    if not fields:
+        return ()
+    names = dict.fromkeys(fields + needed)
+    return (load_only(*(getattr(Submission, name) for name in names), raiseload=True),)
+
+def get_submission(db: Session, submission_id: int, fields: tuple = None):
+    result = db.execute(select(Submission).options(*projection(fields, "version")).where(Submission.id == submission_id))
     return result.scalar_one_or_none()
 
-def get_submissions(db: Session, skip: int = 0, limit: int = 20, search: str = None, age: int = None, preferred_contact: str = None, created_from: str = None, created_to: str = None, sort_by: str = None, sort_order: str = None):
-    query = select(Submission)
+SORTABLE_FIELDS = ("created_at", "full_name", "age")
+
+def encode_cursor(sort_key: str, sort_order: str, value, last_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps({"k": sort_key, "o": sort_order, "v": value, "id": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort_key: str, sort_order: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["k"] != sort_key or payload["o"] != sort_order:
+            raise ValueError("cursor does not match the requested sort")
+        value = payload["v"]
+        if sort_key == "created_at":
+            value = datetime.fromisoformat(value)
+        return value, int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+COUNT_MODES = ("exact", "none", "estimate", "capped")
+COUNT_CAP = int(os.getenv("COUNT_CAP", "1000"))
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "5"))
+COUNT_CACHE_SIZE = 256
+
+# filter key -> (expires_at, total); cleared on every write from this process
+_count_cache = {}
+
+def clear_count_cache():
+    _count_cache.clear()
+
+def _exact_count(db: Session, query, cache_key):
+    now = time.monotonic()
+    cached = _count_cache.get(cache_key)
+    if cached and cached[0] > now:
+        return cached[1]
+    total = db.execute(select(func.count()).select_from(query.subquery())).scalar()
+    if COUNT_CACHE_TTL > 0:
+        if len(_count_cache) >= COUNT_CACHE_SIZE:
+            _count_cache.pop(next(iter(_count_cache)))
+        _count_cache[cache_key] = (now + COUNT_CACHE_TTL, total)
+    return total
+
+def _estimated_count(db: Session, query, filtered: bool):
+    # Planner estimates are only available on PostgreSQL
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    if not filtered:
+        estimate = db.execute(text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'submissions'::regclass")).scalar()
+        # reltuples is -1 until the table has been vacuumed or analyzed
+        return estimate if estimate is not None and estimate >= 0 else None
+    compiled = query.compile(dialect=db.get_bind().dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+def count_submissions(db: Session, query, cache_key, count: str = "exact", count_cap: int = COUNT_CAP):
+    if count == "none":
+        return None, "none"
+    if count == "estimate":
+        estimate = _estimated_count(db, query, filtered=any(v is not None for v in cache_key))
+        if estimate is not None:
+            return estimate, "estimate"
+    elif count == "capped":
+        capped = db.execute(select(func.count()).select_from(query.limit(count_cap + 1).subquery())).scalar()
+        if capped > count_cap:
+            return count_cap, "capped"
+        return capped, "exact"
+    return _exact_count(db, query, cache_key), "exact"
+
+def filter_submissions(dialect_name: str, search: str = None, age: int = None, preferred_contact: str = None, created_from: str = None, created_to: str = None):
+    # Returns the WHERE clauses for the list filters and the search rank expression (or None)
     filters = []
+    rank = None
     if search:
-        filters.append(or_(Submission.full_name.ilike(f"%{search}%"), Submission.email.ilike(f"%{search}%")))
+        condition, rank = search_clause(dialect_name, search)
+        filters.append(condition)
     if age:
         filters.append(Submission.age == age)
     if preferred_contact:
@@ -23,61 +130,241 @@ def get_submissions(db: Session, skip: int = 0, limit: int = 20, search: str = N
         filters.append(Submission.created_at >= created_from)
     if created_to:
         filters.append(Submission.created_at <= created_to)
+    return filters, rank
+
+def sort_submissions(query, rank, sort_by: str = None, sort_order: str = None):
+    # Sorting: the sort column plus id as a tiebreaker, so every row has a unique position
+    if sort_by in SORTABLE_FIELDS:
+        sort_key = sort_by
+        sort_order = "asc" if sort_order == "asc" else "desc"
+    elif sort_by == "relevance" and rank is not None:
+        sort_key, sort_order = "relevance", "desc"
+    else:
+        sort_key, sort_order = "id", "desc"
+    if sort_key == "relevance":
+        # Select the rank next to the entity so the cursor can carry it
+        query = query.add_columns(rank.label("relevance"))
+        sort_col = rank
+    else:
+        sort_col = getattr(Submission, sort_key)
+    direction = asc if sort_order == "asc" else desc
+    if sort_key == "id":
+        query = query.order_by(direction(Submission.id))
+    else:
+        query = query.order_by(direction(sort_col), direction(Submission.id))
+    return query, sort_key, sort_order, sort_col
+
+def get_submissions(db: Session, skip: int = 0, limit: int = 20, search: str = None, age: int = None, preferred_contact: str = None, created_from: str = None, created_to: str = None, sort_by: str = None, sort_order: str = None, cursor: str = None, count: str = "exact", count_cap: int = COUNT_CAP, fields: tuple = None):
+    if count not in COUNT_MODES:
+        raise HTTPException(status_code=400, detail=f"count must be one of {', '.join(COUNT_MODES)}")
+    query = select(Submission)
+    filters, rank = filter_submissions(db.get_bind().dialect.name, search, age, preferred_contact, created_from, created_to)
     if filters:
         query = query.where(and_(*filters))
-    # Sorting
-    if sort_by in ["created_at", "full_name", "age"]:
-        sort_col = getattr(Submission, sort_by)
+    cache_key = (search or None, age or None, preferred_contact or None, created_from or None, created_to or None)
+    total, total_kind = count_submissions(db, query, cache_key, count=count, count_cap=count_cap)
+    query, sort_key, sort_order, sort_col = sort_submissions(query, rank, sort_by, sort_order)
+    query = query.options(*projection(fields, *([sort_key] if sort_key in SORTABLE_FIELDS else [])))
+    # Keyset pagination: seek past the last row of the previous page instead of using OFFSET
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_key, sort_order)
         if sort_order == "asc":
-            query = query.order_by(asc(sort_col))
+            after = Submission.id > last_id if sort_key == "id" else or_(sort_col > value, and_(sort_col == value, Submission.id > last_id))
         else:
-            query = query.order_by(desc(sort_col))
+            after = Submission.id < last_id if sort_key == "id" else or_(sort_col < value, and_(sort_col == value, Submission.id < last_id))
+        query = query.where(after)
     else:
-        query = query.order_by(desc(Submission.id))
-    total_query = select(func.count()).select_from(query.subquery())
-    total = db.execute(total_query).scalar()
-    result = db.execute(query.offset(skip).limit(limit))
-    return {"total": total, "items": result.scalars().all()}
+        query = query.offset(skip)
+    # Fetch one extra row to find out whether another page exists
+    rows = db.execute(query.limit(limit + 1)).all()
+    items = [row[0] for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        value = last.relevance if sort_key == "relevance" else getattr(last[0], sort_key)
+        next_cursor = encode_cursor(sort_key, sort_order, value, last[0].id)
+    return {"total": total, "total_kind": total_kind, "items": items, "next_cursor": next_cursor}
+
+def fills_cache(db: Session) -> bool:
+    # Only primary reads fill the cache: a lagging replica can return a row from before the
+    # write that bumped the key's version, and caching it would undo that write for CACHE_TTL
+    return not db.info.get("replica")
+
+def get_submission_json(db: Session, submission_id: int, if_none_match: str = None, use_cache: bool = True, fields: tuple = None):
+    # Read-through for GET /{id}. Returns (etag, body): body is None when if_none_match
+    # already names the current version, and (None, None) means there is no such row.
+    key = cache.submission_key(submission_id, fields)
+    entry = cache.lookup(key) if use_cache else None
+    etag, body = etags.unpack(entry) if entry is not None else (None, None)
+    if etag is None and if_none_match:
+        # Probe the version without loading the row
+        version = db.execute(select(Submission.version).where(Submission.id == submission_id)).scalar_one_or_none()
+        if version is None:
+            return None, None
+        etag = etags.submission_etag(submission_id, version, fields)
+    if etags.matches(if_none_match, etag):
+        return etag, None
+    if body is None:
+        submission = get_submission(db, submission_id, fields)
+        if submission is None:
+            return None, None
+        etag = etags.submission_etag(submission_id, submission.version, fields)
+        body = submission_json(submission, fields)
+        if fills_cache(db):
+            cache.store(key, etags.pack(etag, body))
+    return etag, body
+
+def get_submissions_json(db: Session, if_none_match: str = None, use_cache: bool = True, **params):
+    # Read-through for list pages, keyed by the normalized query parameters; returns
+    # (etag, body) with body None when the client's copy is current. The validator is a
+    # digest of the rendered page, so a miss costs only the page query itself.
+    key = cache.list_key(params)
+    entry = cache.lookup(key) if use_cache else None
+    if entry is not None:
+        etag, body = etags.unpack(entry)
+    else:
+        body = submissions_page_json(get_submissions(db, **params), params.get("fields"))
+        etag = etags.list_etag(params, body)
+        if fills_cache(db):
+            cache.store(key, etags.pack(etag, body))
+    if etags.matches(if_none_match, etag):
+        return etag, None
+    return etag, body
+
+# Set once alembic 0007 has partitioned submissions (PostgreSQL). Email uniqueness then
+# lives in the submission_emails registry, whose trigger silently skips a duplicate
+# INSERT, so there is no unique index for ON CONFLICT (email) to name.
+SUBMISSIONS_PARTITIONED = os.getenv("SUBMISSIONS_PARTITIONED", "false").lower() in ("1", "true", "yes")
+
+def dialect_insert(db: Session):
+    # INSERT constructs that support ON CONFLICT; None for databases without it
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        return postgresql.insert
+    if name == "sqlite":
+        return sqlite.insert
+    return None
+
+def duplicate_email():
+    return HTTPException(status_code=400, detail={"detail": "Duplicate email"})
 
 def create_submission(db: Session, submission: SubmissionCreate):
-    # Check for duplicate email
-    existing = db.execute(select(Submission).where(Submission.email == submission.email)).first()
-    if existing:
-        print(f"Duplicate email detected: {submission.email}")
-        raise HTTPException(status_code=400, detail={"detail": "Duplicate email"})
-    print(f"Creating submission with data: {submission.dict()}")
-    db_submission = Submission(**submission.dict())
-    db.add(db_submission)
+    values = submission.dict()
+    print(f"Creating submission with data: {values}")
+    upsert = dialect_insert(db)
     try:
-        db.commit()
+        if SUBMISSIONS_PARTITIONED:
+            # The registry trigger drops a duplicate, so again no row back means the email is taken
+            stmt = insert(Submission).values(**values).returning(Submission)
+        elif upsert is not None:
+            # INSERT ... ON CONFLICT (email) DO NOTHING RETURNING: no row back means the email is taken
+            stmt = upsert(Submission).values(**values).on_conflict_do_nothing(index_elements=[Submission.email]).returning(Submission)
+        else:
+            stmt = insert(Submission).values(**values).returning(Submission)
+        db_submission = db.execute(stmt).scalar_one_or_none()
     except IntegrityError as e:
         db.rollback()
         print(f"IntegrityError: {e}")
-        raise HTTPException(status_code=400, detail={"detail": "Duplicate email"})
-    db.refresh(db_submission)
+        raise duplicate_email()
+    if db_submission is None:
+        db.rollback()
+        print(f"Duplicate email detected: {submission.email}")
+        raise duplicate_email()
+    rollups.bump_daily_stats(db, [db_submission.created_at])
+    db.commit()
+    clear_count_cache()
+    cache.invalidate_lists()
     print(f"Submission created: {db_submission}")
     return db_submission
 
-def update_submission(db: Session, submission_id: int, submission: SubmissionUpdate):
-    db_submission = db.execute(select(Submission).where(Submission.id == submission_id)).scalar_one_or_none()
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+
+def insert_submission_rows(db: Session, rows: list):
+    # Inserts one batch inside the caller's transaction and returns {email: id} for the rows
+    # that went in; rows whose email already exists are skipped, not raised.
+    table = Submission.__table__
+    upsert = dialect_insert(db)
+    inserted, created = {}, []
+    if SUBMISSIONS_PARTITIONED or upsert is not None:
+        # executemany with RETURNING is sent as multi-row VALUES (insertmanyvalues); on the
+        # partitioned table the registry trigger skips duplicates instead of ON CONFLICT
+        if SUBMISSIONS_PARTITIONED:
+            stmt = insert(table).returning(table.c.id, table.c.email, table.c.created_at)
+        else:
+            stmt = upsert(table).on_conflict_do_nothing(index_elements=[table.c.email]).returning(table.c.id, table.c.email, table.c.created_at)
+        for row_id, email, created_at in db.execute(stmt, rows):
+            inserted[email] = row_id
+            created.append(created_at)
+    else:
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    row_id, created_at = db.execute(insert(table).values(**row).returning(table.c.id, table.c.created_at)).one()
+                inserted[row["email"]] = row_id
+                created.append(created_at)
+            except IntegrityError:
+                pass
+    rollups.bump_daily_stats(db, created)
+    return inserted
+
+def bulk_insert_submissions(db: Session, rows: list):
+    # One batch, one transaction
+    inserted = insert_submission_rows(db, rows)
+    db.commit()
+    if inserted:
+        clear_count_cache()
+        cache.invalidate_lists()
+    return inserted
+
+def update_columns(db: Session, submission_id: int, values: dict, if_match: str = None):
+    # One conditional UPDATE ... RETURNING of just `values`: no row lock, no SELECT. With
+    # If-Match it only applies to the version the client read; the unique index on email
+    # rejects duplicates, and only when email is among the columns being set.
+    stmt = update(Submission).where(Submission.id == submission_id)
+    versions = etags.if_match_versions(if_match, submission_id) if if_match else None
+    if versions is not None:
+        stmt = stmt.where(Submission.version.in_(versions))
+    stmt = (
+        stmt.values(**values, version=Submission.version + 1)
+        .returning(Submission)
+        .execution_options(populate_existing=True)
+    )
+    try:
+        db_submission = db.execute(stmt).scalar_one_or_none()
+    except IntegrityError:
+        db.rollback()
+        raise duplicate_email()
     if db_submission is None:
+        db.rollback()
+        if if_match:
+            # Changed since the client read it, or gone: either way the precondition failed
+            raise HTTPException(status_code=412, detail="Submission was modified by someone else; reload it and retry")
         return None
-    # Check for duplicate email, excluding the current submission
-    existing = db.execute(
-        select(Submission).where(Submission.email == submission.email, Submission.id != submission_id)
-    ).first()
-    if existing:
-        raise HTTPException(status_code=400, detail={"detail": "Duplicate email"})
-    for key, value in submission.dict().items():
-        setattr(db_submission, key, value)
     db.commit()
-    db.refresh(db_submission)
+    clear_count_cache()
+    cache.invalidate_submission(submission_id)
     return db_submission
 
+def update_submission(db: Session, submission_id: int, submission: SubmissionUpdate, if_match: str = None):
+    return update_columns(db, submission_id, submission.dict(), if_match)
+
+def patch_submission(db: Session, submission_id: int, patch: SubmissionPatch, if_match: str = None):
+    changes = patch.changes()
+    if not changes:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    return update_columns(db, submission_id, changes, if_match)
+
 def delete_submission(db: Session, submission_id: int):
-    db_submission = db.execute(select(Submission).where(Submission.id == submission_id)).scalar_one_or_none()
+    db_submission = db.execute(delete(Submission).where(Submission.id == submission_id).returning(Submission)).scalar_one_or_none()
     if db_submission is None:
+        db.rollback()
         return None
-    db.delete(db_submission)
+    rollups.bump_daily_stats(db, [db_submission.created_at], sign=-1)
     db.commit()
-    return db_submission 
\ No newline at end of file
+    clear_count_cache()
+    cache.invalidate_submission(submission_id)
+    return db_submission
+
+def get_analytics(db: Session, start: date = None, end: date = None):
+    # Reads only the daily rollup, never the submissions table
+    return rollups.get_daily_stats(db, start, end)
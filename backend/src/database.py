@@ -1,27 +1,63 @@
 from dotenv import load_dotenv; load_dotenv()
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+try:
+    from .pooling import engine_options, engine_url
+except ImportError:
+    # alembic/env.py imports this module top-level from src/
+    from pooling import engine_options, engine_url
 
 SQLALCHEMY_DATABASE_URL = os.getenv(
     "DATABASE",
     "sqlite:///:memory:"
 )
+# Serve requests through AsyncEngine/AsyncSession (asyncpg, aiosqlite) instead of the threadpool
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
 
-# Use connect_args only for SQLite
-if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-else:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def async_database_url(url: str) -> str:
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+# Pool class, size and keepalives come from DB_POOL_PROFILE (lambda, server, test)
+# engine_url turns sqlite:///:memory: into a private temp file (see pooling.py)
+engine = create_engine(engine_url(SQLALCHEMY_DATABASE_URL), **engine_options(SQLALCHEMY_DATABASE_URL))
+
+# Writes return rows via RETURNING; keep them loaded after commit instead of re-selecting
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    async_engine = create_async_engine(
+        async_database_url(engine_url(SQLALCHEMY_DATABASE_URL)), **engine_options(SQLALCHEMY_DATABASE_URL, use_async=True)
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
+_schema_ready = False
+
+def init_db():
+    # Creates any missing tables once per process
+    global _schema_ready
+    if _schema_ready:
+        return
+    from . import models, search  # register tables and their DDL hooks with Base
+    Base.metadata.create_all(bind=engine)
+    _schema_ready = True
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close() 
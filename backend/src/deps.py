@@ -1,7 +1,15 @@
-from .database import SessionLocal
+from typing import Union
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from .database import SessionLocal, AsyncSessionLocal, DB_ASYNC
+from . import replicas
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
+AnySession = Union[Session, AsyncSession]
+
 def get_db():
     db = SessionLocal()
     try:
@@ -9,4 +17,50 @@ def get_db():
     finally:
         db.close()
 
-limiter = Limiter(key_func=get_remote_address) 
\ No newline at end of file
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Routes depend on get_session; DB_ASYNC switches them onto the AsyncEngine
+get_session = get_async_db if DB_ASYNC else get_db
+
+def read_replica(request: Request):
+    # Clients that wrote recently keep reading from the primary until the window passes
+    if not replicas.replicas or replicas.reads_primary(request.cookies):
+        return None
+    return replicas.pick_replica()
+
+def get_read_db(request: Request):
+    replica = read_replica(request)
+    db = (replica.SessionLocal if replica else SessionLocal)()
+    db.info["replica"] = replica is not None
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(request: Request):
+    replica = await run_in_threadpool(read_replica, request)
+    async with (replica.AsyncSessionLocal if replica else AsyncSessionLocal)() as db:
+        db.info["replica"] = replica is not None
+        yield db
+
+# Read-only routes depend on get_read_session: a healthy replica, else the primary
+get_read_session = get_async_read_db if DB_ASYNC else get_read_db
+
+def use_cache(request: Request) -> bool:
+    # A client inside its read-your-writes window skips cached copies that a replica may have filled
+    return not replicas.reads_primary(request.cookies)
+
+def mark_write(response: Response):
+    # Only reaches the client when the route succeeds; error responses drop these headers
+    replicas.mark_write(response)
+
+async def run_db(db: AnySession, fn, *args, **kwargs):
+    # crud functions are written against Session. An AsyncSession runs them through
+    # run_sync (greenlet, no thread); a plain Session runs them in the threadpool.
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+limiter = Limiter(key_func=get_remote_address)
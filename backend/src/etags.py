@@ -0,0 +1,54 @@
+import hashlib
+import json
+
+# Strong validators for submission reads. A single row's comes from a cheap version
+# probe, so a matching If-None-Match is answered without loading the row. A list page's
+# is a digest of the page itself: probing a whole filtered set would cost more than the
+# (limited, keyset) page query it stands in for.
+
+def _digest(*parts) -> str:
+    return '"' + hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:32] + '"'
+
+def submission_etag(submission_id: int, version: int, fields: tuple = None) -> str:
+    # Readable so If-Match on PUT can be turned back into the version it names. A ?fields=
+    # projection is a different representation, so it gets its own suffix.
+    if fields:
+        return f'"{submission_id}-{version}-{hashlib.sha1(",".join(fields).encode()).hexdigest()[:8]}"'
+    return f'"{submission_id}-{version}"'
+
+def if_match_versions(if_match: str, submission_id: int):
+    # Versions named by If-Match for this submission; None for "*" (any current version)
+    versions = []
+    for candidate in if_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return None
+        # If-Match uses the strong comparison, so weak validators never match
+        prefix = f'"{submission_id}-'
+        if candidate.startswith(prefix) and candidate.endswith('"'):
+            version = candidate[len(prefix):-1].split("-")[0]
+            if version.isdigit():
+                versions.append(int(version))
+    return versions
+
+def list_etag(params: dict, body: bytes) -> str:
+    # The parameters (cursor, sort, limit) name the page, the body is its content
+    return _digest("submissions", {k: v for k, v in params.items() if v not in (None, "")}, hashlib.sha1(body).hexdigest())
+
+def matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match or not etag:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        # If-None-Match uses the weak comparison, so W/"x" matches "x"
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+# Cache entries hold the validator with the body so a cache hit answers either way without SQL
+def pack(etag: str, body: bytes) -> bytes:
+    return etag.encode() + b"\n" + body
+
+def unpack(entry: bytes):
+    etag, _, body = entry.partition(b"\n")
+    return etag.decode(), body
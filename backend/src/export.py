@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+import os
+import zlib
+from sqlalchemy import and_, select
+from starlette.responses import StreamingResponse
+from . import crud
+from .database import SessionLocal, engine
+from .models import Submission
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_COLUMNS = [column.name for column in Submission.__table__.columns]
+
+def export_query(search: str = None, age: int = None, preferred_contact: str = None, created_from: str = None, created_to: str = None, sort_by: str = None, sort_order: str = None):
+    # Plain column tuples, no ORM identity map: nothing accumulates while streaming
+    query = select(*Submission.__table__.columns)
+    filters, rank = crud.filter_submissions(engine.dialect.name, search, age, preferred_contact, created_from, created_to)
+    if filters:
+        query = query.where(and_(*filters))
+    query, *_ = crud.sort_submissions(query, rank, sort_by, sort_order)
+    # yield_per turns on stream_results: a server-side cursor on PostgreSQL
+    return query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+def json_default(value):
+    # Timestamps in the same ISO format the JSON API uses
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+def encode_rows(rows, format: str) -> bytes:
+    if format == "csv":
+        out = io.StringIO()
+        csv.writer(out).writerows([row[column] for column in EXPORT_COLUMNS] for row in rows)
+        return out.getvalue().encode()
+    return "".join(json.dumps({column: row[column] for column in EXPORT_COLUMNS}, default=json_default) + "\n" for row in rows).encode()
+
+def header(format: str) -> bytes:
+    if format == "csv":
+        return (",".join(EXPORT_COLUMNS) + "\r\n").encode()
+    return b""
+
+def iter_export(query, format: str, replica=None):
+    # Owns its session: the request's session may be closed before the body finishes streaming
+    yield header(format)
+    with (replica.SessionLocal if replica else SessionLocal)() as db:
+        for rows in db.execute(query).mappings().partitions():
+            yield encode_rows(rows, format)
+
+async def aiter_export(query, format: str, replica=None):
+    from .database import AsyncSessionLocal
+    yield header(format)
+    async with (replica.AsyncSessionLocal if replica else AsyncSessionLocal)() as db:
+        result = await db.stream(query)
+        async for rows in result.mappings().partitions():
+            yield encode_rows(rows, format)
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+async def agzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_response(query, format: str, compress: bool, use_async: bool, replica=None) -> StreamingResponse:
+    filename = f"submissions.{format}"
+    if use_async:
+        body = aiter_export(query, format, replica)
+        body = agzip_chunks(body) if compress else body
+    else:
+        body = iter_export(query, format, replica)
+        body = gzip_chunks(body) if compress else body
+    media_type = EXPORT_FORMATS[format]
+    if compress:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.responses import Response
+from . import crud
+from .models import IdempotencyKey
+
+# POST / and POST /bulk with an Idempotency-Key header: the first response (2xx or 4xx) is
+# stored for IDEMPOTENCY_TTL seconds and replayed to retries of the same request without
+# running it again. A retry that arrives while the first is still running waits up to
+# IDEMPOTENCY_WAIT seconds for its result.
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+# An in_progress row expires after this lease instead, so a request whose process died
+# (a Lambda timeout) does not block its retries for the whole TTL. The running request
+# renews it every third of the lease, so only a dead one loses its claim.
+IDEMPOTENCY_LEASE = int(os.getenv("IDEMPOTENCY_LEASE", "120"))
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", "10"))
+IDEMPOTENCY_POLL = 0.05
+# Stored with the body so a replay looks like the original
+REPLAYED_HEADERS = ("location", "etag")
+
+keys = IdempotencyKey.__table__
+
+# key -> Future for requests running in this process, so concurrent retries here wait
+# on it instead of polling the table
+_inflight = {}
+
+def request_hash(request: Request, body: bytes) -> str:
+    return hashlib.sha256(request.method.encode() + b" " + request.url.path.encode() + b"\n" + body).hexdigest()
+
+def claim(db: Session, key: str, digest: str):
+    # Returns None when this request now owns the key, else the stored row. An expired row,
+    # a stored response past its TTL or an abandoned claim past its lease, is taken over.
+    now = datetime.utcnow()
+    db.execute(delete(keys).where(keys.c.key == key, keys.c.expires_at < now))
+    values = {"key": key, "request_hash": digest, "status": "in_progress", "expires_at": now + timedelta(seconds=IDEMPOTENCY_LEASE)}
+    upsert = crud.dialect_insert(db)
+    try:
+        if upsert is not None:
+            claimed = db.execute(upsert(keys).values(**values).on_conflict_do_nothing(index_elements=[keys.c.key])).rowcount == 1
+        else:
+            db.execute(insert(keys).values(**values))
+            claimed = True
+    except IntegrityError:
+        db.rollback()
+        claimed = False
+    db.commit()
+    if claimed:
+        return None
+    return load(db, key)
+
+def load(db: Session, key: str):
+    row = db.execute(select(keys).where(keys.c.key == key)).mappings().one_or_none()
+    return dict(row) if row is not None else None
+
+def owned(key: str, digest: str):
+    # The claim this request made: a row taken over by another request is left alone
+    return (keys.c.key == key, keys.c.request_hash == digest, keys.c.status == "in_progress")
+
+def renew(db: Session, key: str, digest: str):
+    db.execute(update(keys).where(*owned(key, digest)).values(expires_at=datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_LEASE)))
+    db.commit()
+
+def complete(db: Session, key: str, digest: str, status_code: int, headers: dict, body: bytes):
+    db.execute(update(keys).where(*owned(key, digest)).values(
+        status="done", response_status=status_code, response_headers=json.dumps(headers), response_body=body.decode(),
+        expires_at=datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_TTL),
+    ))
+    db.commit()
+
+def release(db: Session, key: str, digest: str):
+    # The request failed without a response worth keeping: let a retry run it
+    db.execute(delete(keys).where(*owned(key, digest)))
+    db.commit()
+
+def with_session(fn, *args):
+    from .database import SessionLocal
+    with SessionLocal() as db:
+        return fn(db, *args)
+
+def replay(state: dict) -> Response:
+    headers = {**json.loads(state["response_headers"] or "{}"), "Idempotent-Replayed": "true"}
+    return Response(content=state["response_body"], status_code=state["response_status"], media_type="application/json", headers=headers)
+
+async def wait_for_result(key: str):
+    # Result of the request holding the key: from this process's future, else by polling
+    future = _inflight.get(key)
+    if future is not None:
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), IDEMPOTENCY_WAIT)
+        except asyncio.TimeoutError:
+            return "timeout"
+    deadline = asyncio.get_running_loop().time() + IDEMPOTENCY_WAIT
+    while asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(IDEMPOTENCY_POLL)
+        state = await run_in_threadpool(with_session, load, key)
+        if state is None or state["status"] == "done":
+            return state
+        if state["expires_at"] < datetime.utcnow():
+            # Its lease ran out: the request holding it is gone, claim() takes it over
+            return None
+    return "timeout"
+
+async def run(request: Request, key: str, execute, response: Response = None) -> Response:
+    # execute() runs the request and returns a Response; response carries headers set by
+    # dependencies (the read-your-writes cookie), which a returned Response would drop
+    if len(key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be at most 255 characters")
+    digest = request_hash(request, await request.body())
+    while True:
+        state = await run_in_threadpool(with_session, claim, key, digest)
+        if state is None:
+            result = await execute_once(key, digest, execute)
+            break
+        if state["request_hash"] != digest:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        if state["status"] != "done":
+            state = await wait_for_result(key)
+            if state == "timeout":
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress", headers={"Retry-After": "1"})
+            if state is None:
+                # The first attempt failed and released the key, or its lease ran out; try to take it
+                continue
+        result = replay(state)
+        break
+    if response is not None:
+        result.headers.raw.extend(response.headers.raw)
+    return result
+
+async def keep_claim(key: str, digest: str):
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_LEASE / 3)
+        try:
+            await run_in_threadpool(with_session, renew, key, digest)
+        except Exception as e:
+            # The next renewal may get through before the lease runs out
+            print(f"Idempotency lease renewal failed: {e}")
+
+async def execute_once(key: str, digest: str, execute) -> Response:
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    renewal = asyncio.create_task(keep_claim(key, digest))
+    try:
+        try:
+            result = await execute()
+        except HTTPException as e:
+            if e.status_code >= 500:
+                raise
+            # Client errors (duplicate email, bad body) are the answer for this request too
+            result = Response(content=json.dumps({"detail": e.detail}), status_code=e.status_code, media_type="application/json", headers=e.headers)
+        headers = {name: value for name, value in result.headers.items() if name in REPLAYED_HEADERS}
+        await run_in_threadpool(with_session, complete, key, digest, result.status_code, headers, result.body)
+    except BaseException:
+        await run_in_threadpool(with_session, release, key, digest)
+        future.set_result(None)
+        raise
+    else:
+        future.set_result({"response_status": result.status_code, "response_headers": json.dumps(headers), "response_body": result.body.decode(), "status": "done"})
+        return result
+    finally:
+        # A renewal that lands after complete() or release() matches no in_progress row
+        renewal.cancel()
+        _inflight.pop(key, None)
+
+def purge_expired(db: Session):
+    deleted = db.execute(delete(keys).where(keys.c.expires_at < datetime.utcnow())).rowcount
+    db.commit()
+    return deleted
@@ -0,0 +1,83 @@
+import json
+import logging
+import time
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from . import crud
+from .deps import AnySession, run_db
+from .schemas import SubmissionCreate
+
+logger = logging.getLogger("app")
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+
+def validate_rows(rows):
+    # rows: [(index, raw)]. Runs in the threadpool: bleach is too slow for the event loop at import sizes.
+    valid, invalid = [], []
+    for index, raw in rows:
+        if isinstance(raw, ValueError):
+            invalid.append({"index": index, "status": "invalid", "errors": [{"msg": f"Invalid JSON: {raw}"}]})
+            continue
+        try:
+            valid.append((index, SubmissionCreate.model_validate(raw).dict()))
+        except ValidationError as e:
+            invalid.append({"index": index, "status": "invalid", "errors": e.errors(include_url=False, include_context=False)})
+    return valid, invalid
+
+async def json_array_chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield list(enumerate(items[start:start + size], start))
+
+async def ndjson_chunks(stream, size: int):
+    # Parses the body line by line as it arrives, so at most one batch of rows is held at a time
+    chunk, buffer, index = [], b"", 0
+
+    def parse(line):
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            return e
+
+    async for data in stream:
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            chunk.append((index, parse(line)))
+            index += 1
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if buffer.strip():
+        chunk.append((index, parse(buffer)))
+    if chunk:
+        yield chunk
+
+async def ingest(db: AnySession, chunks):
+    start = time.perf_counter()
+    results, seen_emails = [], set()
+    async for chunk in chunks:
+        valid, invalid = await run_in_threadpool(validate_rows, chunk)
+        results.extend(invalid)
+        batch = []
+        for index, values in valid:
+            if values["email"] in seen_emails:
+                results.append({"index": index, "status": "duplicate"})
+                continue
+            seen_emails.add(values["email"])
+            batch.append((index, values))
+        if not batch:
+            continue
+        inserted = await run_db(db, crud.bulk_insert_submissions, [values for _, values in batch])
+        for index, values in batch:
+            if values["email"] in inserted:
+                results.append({"index": index, "status": "created", "id": inserted[values["email"]]})
+            else:
+                results.append({"index": index, "status": "duplicate"})
+    elapsed = time.perf_counter() - start
+    results.sort(key=lambda item: item["index"])
+    counts = {status: sum(1 for item in results if item["status"] == status) for status in ("created", "duplicate", "invalid")}
+    rows_per_second = len(results) / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Bulk ingest: {len(results)} rows, {counts['created']} created in {elapsed * 1000:.2f} ms ({rows_per_second:.0f} rows/s)")
+    return {**counts, "elapsed_ms": elapsed * 1000, "rows_per_second": rows_per_second, "items": results}
@@ -1,5 +1,8 @@
 from dotenv import load_dotenv; load_dotenv()
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+import os
 from fastapi.middleware.cors import CORSMiddleware
 from .routes import router as submissions_router
 from mangum import Mangum
@@ -8,19 +11,41 @@ from fastapi import Request
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
-from .database import Base, engine, SQLALCHEMY_DATABASE_URL
+from .database import Base, engine, async_engine, SQLALCHEMY_DATABASE_URL, init_db
+from .pooling import WORKER_THREADS, pool_metrics
+from . import replicas, partitions, writequeue, singleflight
+from anyio import to_thread
 from .models import Submission  # Import all models to register them with Base
-import time
 from starlette.responses import Response
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 from .deps import limiter
-
-app = FastAPI()
+from .middleware import RequestLoggingMiddleware
+
+# eager: create tables at import (local dev default). lazy: skip it at import so a
+# cold start only loads code; tables come from `python -m src.manage init-db`,
+# migrations, or the lifespan hook when INIT_DB_ON_STARTUP is set.
+STARTUP_MODE = os.getenv("STARTUP_MODE", "eager")
+INIT_DB_ON_STARTUP = os.getenv("INIT_DB_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sync routes and run_db share this threadpool; the server pool profile is sized to match it
+    to_thread.current_default_thread_limiter().total_tokens = WORKER_THREADS
+    if STARTUP_MODE == "lazy" and INIT_DB_ON_STARTUP:
+        # Mangum runs the lifespan on every invocation; init_db only does work once
+        await run_in_threadpool(init_db)
+    # Month partitions ahead of now; a scheduled `python -m src.partitions ensure` does the same
+    await run_in_threadpool(partitions.ensure_once)
+    # WRITE_MODE=queue: POST /api/submissions/ hands rows to this consumer
+    await writequeue.start()
+    yield
+    await writequeue.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,12 +53,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the frontend read validators for conditional requests
+    expose_headers=["ETag"],
 )
 
+# Request logging and security headers in one pure ASGI layer (outermost)
+app.add_middleware(RequestLoggingMiddleware)
+
 app.include_router(submissions_router)
 
-# Create all tables at startup
-Base.metadata.create_all(bind=engine)
+if STARTUP_MODE == "eager":
+    init_db()
 
 print(f"[Startup] Using database URL: {SQLALCHEMY_DATABASE_URL}")
 
@@ -42,41 +72,6 @@ logger = logging.getLogger("app")
 # Rate Limiter
 app.state.limiter = limiter
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logger.info(f"Request: {request.method} {request.url} from {request.client.host}")
-    start_time = time.time()
-    try:
-        body = await request.body()
-        logger.info(f"Request body: {body.decode('utf-8')}")
-    except Exception:
-        logger.info("Could not read request body.")
-
-    response = await call_next(request)
-    process_time = (time.time() - start_time) * 1000
-    logger.info(f"Response status: {response.status_code} ({process_time:.2f} ms)")
-
-    # Log response body for errors
-    if response.status_code >= 400:
-        resp_body = b""
-        async for chunk in response.body_iterator:
-            resp_body += chunk
-        logger.error(f"Response body: {resp_body.decode('utf-8')}")
-        # Rebuild the response for downstream
-        response = Response(content=resp_body, status_code=response.status_code, headers=dict(response.headers), media_type=response.media_type)
-
-    return response
-
-@app.middleware("http")
-async def add_security_headers(request, call_next):
-    response = await call_next(request)
-    response.headers["Strict-Transport-Security"] = "max-age=63072000; includeSubDomains; preload"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["Referrer-Policy"] = "no-referrer"
-    response.headers["Permissions-Policy"] = "geolocation=(), microphone=()"
-    return response
-
 # Uncomment to enforce HTTPS in production
 # app.add_middleware(HTTPSRedirectMiddleware)
 
@@ -108,4 +103,31 @@ async def internal_exception_handler(request: Request, exc: Exception):
 def health_check():
     return {"status": "ok"}
 
-handler = Mangum(app) 
\ No newline at end of file
+@app.get("/api/metrics/pool")
+def pool_metrics_endpoint():
+    # Checkout waits and saturation per worker process, for sizing Postgres max_connections
+    return {
+        "sync": pool_metrics(engine),
+        "async": pool_metrics(async_engine),
+        "replicas": [
+            {**state, "sync": pool_metrics(replica.engine), "async": pool_metrics(replica.async_engine)}
+            for replica, state in zip(replicas.replicas, replicas.status())
+        ],
+        # Reads that ran versus reads that shared another request's execution
+        "singleflight": dict(singleflight.reads.stats),
+    }
+
+http_handler = Mangum(app)
+
+def handler(event, context):
+    # EventBridge schedule rules invoke the same function with a constant input naming a task
+    if isinstance(event, dict) and event.get("task") == "archive":
+        from . import archive
+        return archive.run_scheduled(event, context)
+    if isinstance(event, dict) and event.get("task") == "partitions":
+        from . import partitions
+        return partitions.run_scheduled(event, context)
+    # WRITE_MODE=sqs: the queue's event source mapping delivers batches of accepted submissions
+    if isinstance(event, dict) and event.get("Records") and event["Records"][0].get("eventSource") == "aws:sqs":
+        return writequeue.handle_sqs(event)
+    return http_handler(event, context)
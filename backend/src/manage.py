@@ -0,0 +1,22 @@
+import argparse
+import time
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Form Management API maintenance commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("init-db", help="Create any missing tables (deployments that run with STARTUP_MODE=lazy)")
+    sub.add_parser("purge-idempotency-keys", help="Delete stored Idempotency-Key responses past IDEMPOTENCY_TTL")
+    args = parser.parse_args(argv)
+    if args.command == "init-db":
+        from .database import init_db, SQLALCHEMY_DATABASE_URL
+        start = time.perf_counter()
+        init_db()
+        print(f"Schema ready on {SQLALCHEMY_DATABASE_URL.split('@')[-1]} ({(time.perf_counter() - start) * 1000:.0f} ms)")
+    elif args.command == "purge-idempotency-keys":
+        from .database import SessionLocal
+        from .idempotency import purge_expired
+        with SessionLocal() as db:
+            print(f"Purged {purge_expired(db)} expired idempotency key(s)")
+
+if __name__ == "__main__":
+    main()
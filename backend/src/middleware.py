@@ -0,0 +1,80 @@
+import logging
+import os
+import re
+import time
+from starlette.datastructures import Headers, MutableHeaders
+
+logger = logging.getLogger("app")
+
+# Bytes of request/error-response bodies copied into the log; the rest passes through untouched
+LOG_BODY_LIMIT = int(os.getenv("LOG_BODY_LIMIT", "2048"))
+# Bodies of these types are never read for logging
+UNLOGGED_CONTENT_TYPES = ("multipart/", "application/octet-stream")
+REDACTED_FIELDS = ("password", "token", "access_token", "refresh_token", "secret")
+
+SECURITY_HEADERS = {
+    "Strict-Transport-Security": "max-age=63072000; includeSubDomains; preload",
+    "X-Frame-Options": "DENY",
+    "X-Content-Type-Options": "nosniff",
+    "Referrer-Policy": "no-referrer",
+    "Permissions-Policy": "geolocation=(), microphone=()",
+}
+
+_fields = "|".join(REDACTED_FIELDS).encode()
+_json_secret = re.compile(rb'("(?:' + _fields + rb')"\s*:\s*)"(?:[^"\\]|\\.)*"?', re.IGNORECASE)
+_form_secret = re.compile(rb'((?:^|&)(?:' + _fields + rb')=)[^&]*', re.IGNORECASE)
+
+def redact(body: bytes) -> str:
+    body = _json_secret.sub(rb'\1"***"', body)
+    body = _form_secret.sub(rb'\1***', body)
+    return body.decode("utf-8", errors="replace")
+
+class RequestLoggingMiddleware:
+    # Pure ASGI: logs requests, tees at most LOG_BODY_LIMIT bytes of request bodies and
+    # error responses as they stream past, and sets the security headers. Nothing is buffered.
+    def __init__(self, app, body_limit: int = None):
+        self.app = app
+        self.body_limit = LOG_BODY_LIMIT if body_limit is None else body_limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start_time = time.perf_counter()
+        limit = self.body_limit
+        client = scope.get("client")
+        path = scope.get("path", "")
+        if scope.get("query_string"):
+            path += "?" + scope["query_string"].decode("latin-1")
+        logger.info(f"Request: {scope['method']} {path} from {client[0] if client else 'unknown'}")
+        content_type = Headers(scope=scope).get("content-type", "")
+        tee_request = limit > 0 and not content_type.startswith(UNLOGGED_CONTENT_TYPES)
+        request_head = bytearray()
+        response_head = bytearray()
+        status = 500
+
+        async def receive_and_tee():
+            message = await receive()
+            if tee_request and message["type"] == "http.request" and len(request_head) < limit:
+                request_head.extend(message.get("body", b"")[: limit - len(request_head)])
+            return message
+
+        async def send_and_tee(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                for name, value in SECURITY_HEADERS.items():
+                    headers[name] = value
+                if request_head:
+                    logger.info(f"Request body: {redact(bytes(request_head))}")
+                process_time = (time.perf_counter() - start_time) * 1000
+                logger.info(f"Response status: {status} ({process_time:.2f} ms)")
+            elif message["type"] == "http.response.body" and status >= 400:
+                if len(response_head) < limit:
+                    response_head.extend(message.get("body", b"")[: limit - len(response_head)])
+                if not message.get("more_body", False):
+                    logger.error(f"Response body: {redact(bytes(response_head))}")
+            await send(message)
+
+        await self.app(scope, receive_and_tee, send_and_tee)
@@ -1,22 +1,97 @@
-from sqlalchemy import Column, Integer, String, Text, CheckConstraint, TIMESTAMP, func
+from sqlalchemy import Column, ForeignKey, Integer, SmallInteger, BigInteger, String, Text, CheckConstraint, Index, TIMESTAMP, Date, func
+from sqlalchemy.dialects import sqlite
 try:
     from .database import Base
 except ImportError:
     from database import Base
 
+# SQLite's CURRENT_TIMESTAMP has no fractional seconds; bind datetimes in the
+# same format so keyset comparisons against server-generated values line up.
+Timestamp = TIMESTAMP().with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
+
 class Submission(Base):
     __tablename__ = "submissions"
     id = Column(Integer, primary_key=True, index=True)
     full_name = Column(String(255), nullable=False, index=True)
+    # On PostgreSQL after migration 0007 the table is partitioned by created_at month and
+    # uniqueness is enforced by the submission_emails registry instead (see partitions.py)
     email = Column(String(255), nullable=False, unique=True, index=True)
     phone_number = Column(String(20), nullable=False, index=True)
     age = Column(Integer, nullable=False)
     address = Column(Text)
     preferred_contact = Column(String(20), nullable=False)
-    created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
-    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False)
+    created_at = Column(Timestamp, server_default=func.now(), nullable=False)
+    updated_at = Column(Timestamp, server_default=func.now(), onupdate=func.now(), nullable=False)
+    # Optimistic concurrency: crud.update_submission increments it and checks it against If-Match
+    version = Column(Integer, nullable=False, server_default="1")
 
     __table_args__ = (
         CheckConstraint('age >= 18 AND age <= 120', name='age_range'),
         CheckConstraint("preferred_contact IN ('Email', 'Phone', 'Both')", name='preferred_contact_check'),
-    ) 
\ No newline at end of file
+        # List filter/sort combinations (see migration 0006). id is the sort tiebreaker, so
+        # it closes each key and keyset pages seek straight to their position.
+        # The created_at index also covers the table view (fields=full_name,email,created_at)
+        # with an index-only scan on PostgreSQL.
+        Index('ix_submissions_created_at_id', 'created_at', 'id', postgresql_include=['full_name', 'email']),
+        Index('ix_submissions_contact_created_at', 'preferred_contact', 'created_at', 'id'),
+        Index('ix_submissions_age_created_at', 'age', 'created_at', 'id'),
+    )
+
+class SubmissionDailyStats(Base):
+    # Per-day submission counts kept up to date by the crud write paths (see rollups.py).
+    # Each day is split over ROLLUP_BUCKETS rows so concurrent writers rarely share a row lock;
+    # readers sum the buckets.
+    __tablename__ = "submission_daily_stats"
+    day = Column(Date, primary_key=True)
+    bucket = Column(SmallInteger, primary_key=True, default=0, server_default="0")
+    submission_count = Column(Integer, nullable=False, default=0)
+
+class SubmissionArchive(Base):
+    # Manifest of archived batches: one gzip NDJSON object per batch (see archive.py)
+    __tablename__ = "submission_archives"
+    id = Column(Integer, primary_key=True)
+    object_key = Column(String(512), nullable=False, unique=True)
+    row_count = Column(Integer, nullable=False)
+    byte_size = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    first_id = Column(Integer, nullable=False)
+    last_id = Column(Integer, nullable=False)
+    created_from = Column(Timestamp, nullable=False)
+    created_to = Column(Timestamp, nullable=False)
+    archived_at = Column(Timestamp, server_default=func.now(), nullable=False)
+    rehydrated_at = Column(Timestamp)
+
+    __table_args__ = (
+        Index('ix_submission_archives_created', 'created_from', 'created_to'),
+    )
+
+class SubmissionRehydration(Base):
+    # Rows loaded back from an archived batch; archive_batch skips them so they stay hot
+    __tablename__ = "submission_rehydrations"
+    submission_id = Column(Integer, primary_key=True, autoincrement=False)
+    archive_id = Column(Integer, ForeignKey("submission_archives.id", ondelete="CASCADE"), nullable=False)
+    rehydrated_at = Column(Timestamp, server_default=func.now(), nullable=False)
+
+class SubmissionReceipt(Base):
+    # Outcome of a submission accepted with 202 in queued write mode (see writequeue.py)
+    __tablename__ = "submission_receipts"
+    id = Column(String(32), primary_key=True)
+    status = Column(String(20), nullable=False)
+    submission_id = Column(Integer)
+    email = Column(String(255), nullable=False)
+    detail = Column(Text)
+    processed_at = Column(Timestamp, server_default=func.now(), nullable=False)
+
+class IdempotencyKey(Base):
+    # First response to a POST carrying an Idempotency-Key, replayed on retries (see idempotency.py)
+    __tablename__ = "idempotency_keys"
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status = Column(String(20), nullable=False)
+    response_status = Column(Integer)
+    response_headers = Column(Text)
+    response_body = Column(Text)
+    expires_at = Column(Timestamp, nullable=False, index=True)
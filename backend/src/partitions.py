@@ -0,0 +1,115 @@
+import argparse
+import os
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from . import crud, rollups, cache
+
+# Maintenance for the month-partitioned submissions table (alembic 0007, PostgreSQL only).
+# Everything here is a no-op on other databases or while SUBMISSIONS_PARTITIONED is off.
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+
+_ensured = False
+
+def partitioned(db: Session) -> bool:
+    return crud.SUBMISSIONS_PARTITIONED and db.get_bind().dialect.name == "postgresql"
+
+def partition_name(month: date) -> str:
+    # Must match the names ensure_submission_partitions() creates
+    return f"submissions_y{month:%Y}m{month:%m}"
+
+def parse_month(value: str) -> date:
+    # "2024-03" -> date(2024, 3, 1)
+    year, month = value.split("-")[:2]
+    return date(int(year), int(month), 1)
+
+def ensure_partitions(db: Session, months_ahead: int = PARTITION_MONTHS_AHEAD):
+    # Creates this month's and the next months_ahead months' partitions if missing;
+    # rows past the last one land in submissions_default rather than failing
+    if not partitioned(db):
+        return []
+    created = list(db.execute(text("SELECT ensure_submission_partitions(:months_ahead)"), {"months_ahead": months_ahead}).scalars())
+    db.commit()
+    return created
+
+def ensure_once():
+    # Startup hook: once per process, and never fatal (the default partition catches inserts)
+    global _ensured
+    if _ensured or not crud.SUBMISSIONS_PARTITIONED:
+        return
+    from .database import SessionLocal
+    try:
+        with SessionLocal() as db:
+            created = ensure_partitions(db)
+        _ensured = True
+        if created:
+            print(f"Created partitions: {', '.join(created)}")
+    except Exception as e:
+        print(f"Partition check failed: {e}")
+
+def run_scheduled(event: dict, context=None):
+    # EventBridge schedule target: {"task": "partitions", "months_ahead": 3}. Long-running
+    # servers only ensure partitions at startup, so this keeps months ahead of the clock.
+    from .database import SessionLocal
+    with SessionLocal() as db:
+        created = ensure_partitions(db, int(event.get("months_ahead", PARTITION_MONTHS_AHEAD)))
+    if created:
+        print(f"Created partitions: {', '.join(created)}")
+    return {"created": created}
+
+def list_partitions(db: Session):
+    # [(name, bounds, estimated rows)] in bound order
+    if not partitioned(db):
+        return []
+    rows = db.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'submissions'::regclass
+        ORDER BY c.relname
+    """))
+    return [tuple(row) for row in rows]
+
+def detach_partition(db: Session, month: date):
+    # Detaching is a catalog change, not a DELETE: the month's rows stay in a standalone
+    # table (archive or DROP it later). Their emails leave the registry so they can be
+    # submitted again, and the daily rollup forgets the month.
+    if not partitioned(db):
+        return None
+    name = partition_name(month)
+    if db.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is None:
+        return None
+    db.execute(text(f'ALTER TABLE submissions DETACH PARTITION "{name}"'))
+    db.execute(text(f'DELETE FROM submission_emails e USING "{name}" s WHERE e.email = s.email AND e.submission_id = s.id'))
+    db.commit()
+    next_month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+    rollups.reconcile_daily_stats(db, month, date.fromordinal(next_month.toordinal() - 1))
+    crud.clear_count_cache()
+    cache.invalidate_lists()
+    return name
+
+def main(argv=None):
+    from .database import SessionLocal
+    parser = argparse.ArgumentParser(description="Maintain the month partitions of submissions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ensure = sub.add_parser("ensure", help="Create partitions for the coming months (run on a schedule)")
+    ensure.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    sub.add_parser("list", help="Show partitions with their bounds and estimated row counts")
+    detach = sub.add_parser("detach", help="Detach one month's partition from submissions")
+    detach.add_argument("month", type=parse_month, help="YYYY-MM")
+    args = parser.parse_args(argv)
+    with SessionLocal() as db:
+        if not partitioned(db):
+            print("submissions is not partitioned (PostgreSQL with SUBMISSIONS_PARTITIONED=true only)")
+            return
+        if args.command == "ensure":
+            created = ensure_partitions(db, args.months_ahead)
+            print(f"Created {len(created)} partition(s){': ' + ', '.join(created) if created else ''}")
+        elif args.command == "list":
+            for name, bounds, rows in list_partitions(db):
+                print(f"{name:<24} {rows:>10}  {bounds}")
+        else:
+            name = detach_partition(db, args.month)
+            print(f"Detached {name}" if name else f"No partition {partition_name(args.month)}")
+
+if __name__ == "__main__":
+    main()
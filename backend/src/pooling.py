@@ -0,0 +1,170 @@
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+# lambda: one request per container at a time, keep a single warm connection.
+# server: uvicorn worker, pool sized to the threadpool that runs sync DB work.
+# test: no pooling; in-memory SQLite is backed by a private temp file (see engine_url).
+POOL_PROFILES = ("lambda", "server", "test")
+
+# anyio's default threadpool is 40 threads; main.py applies this to the limiter at startup
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "40"))
+
+PROFILE_DEFAULTS = {
+    # A second slot covers an export stream opening its own session while the request's is held
+    "lambda": {"pool_size": 1, "max_overflow": 1, "pool_timeout": 5, "pool_recycle": 300, "pool_pre_ping": True},
+    # Every worker thread can hold a connection; only the first pool_size stay open when idle
+    "server": {"pool_size": 10, "max_overflow": max(WORKER_THREADS - 10, 0), "pool_timeout": 30, "pool_recycle": 1800, "pool_pre_ping": True},
+}
+
+# libpq keepalives so a NAT or load balancer doesn't silently drop idle pooled connections
+TCP_KEEPALIVES = {
+    "keepalives": 1,
+    "keepalives_idle": int(os.getenv("DB_KEEPALIVES_IDLE", "30")),
+    "keepalives_interval": int(os.getenv("DB_KEEPALIVES_INTERVAL", "10")),
+    "keepalives_count": int(os.getenv("DB_KEEPALIVES_COUNT", "5")),
+}
+
+def default_profile(url: str) -> str:
+    if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+        return "lambda"
+    if is_memory_sqlite(url):
+        return "test"
+    return "server"
+
+def is_memory_sqlite(url: str) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+_memory_files = {}
+
+def engine_url(url: str) -> str:
+    # A :memory: database lives on one connection, and sharing that connection across the
+    # threadpool interleaves transactions (one session's rollback undoes another's commit).
+    # Give it a private file for the life of the process instead: every session gets its own
+    # connection, and the sync and async engines see the same data.
+    if not is_memory_sqlite(url):
+        return url
+    if url not in _memory_files:
+        directory = tempfile.mkdtemp(prefix="formapp-")
+        atexit.register(shutil.rmtree, directory, True)
+        _memory_files[url] = os.path.join(directory, "db.sqlite")
+    return make_url(url).set(database=_memory_files[url]).render_as_string(hide_password=False)
+
+
+class PoolMetrics:
+    # Checkout wait times and peak usage, read by GET /api/metrics/pool
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+            self.peak_checked_out = 0
+
+    def record(self, waited: float, checked_out: int, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def snapshot(self, pool) -> dict:
+        capacity = pool.size() + max(pool.max_overflow, 0)
+        checked_out = pool.checkedout()
+        with self._lock:
+            return {
+                "pool_size": pool.size(),
+                "max_overflow": pool.max_overflow,
+                "checked_out": checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "saturation": round(checked_out / capacity, 3) if capacity else None,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+            }
+
+
+class _TimedCheckout:
+    # _do_get is where QueuePool blocks for a free connection (up to pool_timeout)
+    def __init__(self, *args, max_overflow: int = 10, **kwargs):
+        super().__init__(*args, max_overflow=max_overflow, **kwargs)
+        # As configured (QueuePool's default is 10); -1 means no limit
+        self.max_overflow = max_overflow
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - start, self.checkedout(), timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start, self.checkedout())
+        return conn
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, profile: str = None, use_async: bool = False) -> dict:
+    # Keyword arguments for create_engine / create_async_engine under a named profile.
+    # DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and DB_POOL_RECYCLE override the profile.
+    profile = profile or os.getenv("DB_POOL_PROFILE") or default_profile(url)
+    if profile not in POOL_PROFILES:
+        raise ValueError(f"Unknown DB_POOL_PROFILE {profile!r}, expected one of {', '.join(POOL_PROFILES)}")
+    backend = make_url(url).get_backend_name()
+    driver = make_url(url).get_driver_name()
+    options = {"connect_args": {}}
+    if backend == "sqlite":
+        options["connect_args"]["check_same_thread"] = False
+    elif backend == "postgresql" and driver == "psycopg2":
+        # asyncpg takes no keepalive arguments; it relies on the OS defaults
+        options["connect_args"].update(TCP_KEEPALIVES)
+
+    if profile == "test":
+        options["poolclass"] = NullPool
+        return options
+
+    settings = dict(PROFILE_DEFAULTS[profile])
+    for key, env in (("pool_size", "DB_POOL_SIZE"), ("max_overflow", "DB_MAX_OVERFLOW"),
+                     ("pool_timeout", "DB_POOL_TIMEOUT"), ("pool_recycle", "DB_POOL_RECYCLE")):
+        if os.getenv(env):
+            settings[key] = int(os.getenv(env))
+    options.update(settings)
+    options["poolclass"] = InstrumentedAsyncQueuePool if use_async else InstrumentedQueuePool
+    return options
+
+def pool_metrics(engine) -> dict:
+    if engine is None:
+        return None
+    pool = engine.pool
+    metrics = getattr(pool, "metrics", None)
+    if metrics is None:
+        return {"pool": type(pool).__name__}
+    return {"pool": type(pool).__name__, **metrics.snapshot(pool)}
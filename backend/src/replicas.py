@@ -0,0 +1,98 @@
+import itertools
+import os
+import threading
+import time
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from .database import DB_ASYNC, async_database_url
+from .pooling import engine_options
+
+# Comma-separated read replica URLs; reads stay on the primary when empty
+DATABASE_REPLICAS = [url.strip() for url in os.getenv("DATABASE_REPLICAS", "").split(",") if url.strip()]
+# Replicas further behind than this (seconds) are skipped until they catch up
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+# Seconds between health/lag probes of each replica
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "10"))
+# After a write the client reads from the primary for this many seconds
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+READ_YOUR_WRITES_COOKIE = "read_primary_until"
+
+# The replay timestamp is that of the last replayed transaction, so on an idle primary
+# now() minus it keeps growing; a standby that has replayed everything it received is caught up
+POSTGRES_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+def replication_lag(conn) -> float:
+    if conn.dialect.name == "postgresql":
+        return float(conn.execute(POSTGRES_LAG_SQL).scalar())
+    # SQLite has no replication; a reachable file counts as caught up
+    conn.execute(text("SELECT 1"))
+    return 0.0
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = create_engine(url, **engine_options(url))
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=self.engine)
+        self.async_engine = None
+        self.AsyncSessionLocal = None
+        if DB_ASYNC:
+            self.async_engine = create_async_engine(async_database_url(url), **engine_options(url, use_async=True))
+            self.AsyncSessionLocal = async_sessionmaker(self.async_engine, autoflush=False, expire_on_commit=False)
+        self.healthy = True
+        self.lag = 0.0
+        self.checked_at = None
+        self._checking = threading.Lock()
+
+    def check(self):
+        try:
+            with self.engine.connect() as conn:
+                self.lag = replication_lag(conn)
+            self.healthy = True
+        except Exception as e:
+            print(f"Replica {self.engine.url!r} unavailable: {e}")
+            self.healthy = False
+        self.checked_at = time.monotonic()
+
+    def usable(self) -> bool:
+        due = self.checked_at is None or time.monotonic() - self.checked_at >= REPLICA_CHECK_INTERVAL
+        # One thread probes; concurrent requests use the last known state
+        if due and self._checking.acquire(blocking=self.checked_at is None):
+            try:
+                self.check()
+            finally:
+                self._checking.release()
+        return self.healthy and self.lag <= REPLICA_MAX_LAG
+
+
+replicas = [Replica(url) for url in DATABASE_REPLICAS]
+_round_robin = itertools.count()
+
+def pick_replica():
+    # None means read from the primary
+    candidates = [replica for replica in replicas if replica.usable()]
+    if not candidates:
+        return None
+    return candidates[next(_round_robin) % len(candidates)]
+
+def reads_primary(cookies) -> bool:
+    try:
+        return float(cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def mark_write(response):
+    if replicas:
+        until = time.time() + READ_YOUR_WRITES_SECONDS
+        response.set_cookie(READ_YOUR_WRITES_COOKIE, f"{until:.3f}", max_age=READ_YOUR_WRITES_SECONDS, httponly=True, samesite="lax")
+
+def status() -> list:
+    return [
+        {"url": replica.engine.url.render_as_string(hide_password=True), "healthy": replica.healthy, "lag_seconds": replica.lag}
+        for replica in replicas
+    ]
@@ -0,0 +1,94 @@
+import argparse
+import os
+import random
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import select, func, delete, update, insert
+from sqlalchemy.orm import Session
+from . import crud
+from .models import Submission, SubmissionDailyStats
+
+# Rows per day. Every write bumps today's count, so with one row per day concurrent writers
+# would queue on its lock until commit; a random bucket per transaction spreads them out.
+ROLLUP_BUCKETS = int(os.getenv("ROLLUP_BUCKETS", "16"))
+
+stats = SubmissionDailyStats.__table__
+
+def bump_daily_stats(db: Session, created: list, sign: int = 1):
+    # Adds (or with sign=-1 removes) rows to the per-day counts inside the caller's transaction.
+    # A bucket may go negative after deletes; only the per-day sum is meaningful.
+    counts = Counter(created_at.date() for created_at in created)
+    if not counts:
+        return
+    bucket = random.randrange(ROLLUP_BUCKETS)
+    rows = [{"day": day, "bucket": bucket, "submission_count": sign * n} for day, n in counts.items()]
+    upsert = crud.dialect_insert(db)
+    if upsert is not None:
+        stmt = upsert(stats)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[stats.c.day, stats.c.bucket],
+            set_={"submission_count": stats.c.submission_count + stmt.excluded.submission_count},
+        )
+        db.execute(stmt, rows)
+        return
+    for row in rows:
+        changed = db.execute(
+            update(stats).where(stats.c.day == row["day"], stats.c.bucket == row["bucket"]).values(submission_count=stats.c.submission_count + row["submission_count"])
+        ).rowcount
+        if not changed:
+            db.execute(insert(stats).values(**row))
+
+def _as_date(value):
+    # func.date() comes back as a string on SQLite
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+def reconcile_daily_stats(db: Session, start: date = None, end: date = None):
+    # Recomputes the rollup from submissions for [start, end] and returns the days that had drifted
+    day = func.date(Submission.created_at)
+    query = select(day, func.count()).group_by(day)
+    if start:
+        query = query.where(Submission.created_at >= datetime.combine(start, time.min))
+    if end:
+        query = query.where(Submission.created_at < datetime.combine(end + timedelta(days=1), time.min))
+    actual = {_as_date(d): n for d, n in db.execute(query)}
+    existing = select(stats.c.day, func.sum(stats.c.submission_count)).group_by(stats.c.day)
+    if start:
+        existing = existing.where(stats.c.day >= start)
+    if end:
+        existing = existing.where(stats.c.day <= end)
+    recorded = {_as_date(d): n for d, n in db.execute(existing)}
+    drift = {d: (recorded.get(d, 0), actual.get(d, 0)) for d in set(actual) | set(recorded) if recorded.get(d, 0) != actual.get(d, 0)}
+    for d, (_, n) in drift.items():
+        # Collapse the day's buckets into bucket 0 holding the true count
+        db.execute(delete(stats).where(stats.c.day == d))
+        if n:
+            db.execute(insert(stats).values(day=d, bucket=0, submission_count=n))
+    db.commit()
+    return drift
+
+def get_daily_stats(db: Session, start: date = None, end: date = None):
+    total = func.sum(stats.c.submission_count)
+    query = select(stats.c.day, total).group_by(stats.c.day).having(total > 0).order_by(stats.c.day)
+    if start:
+        query = query.where(stats.c.day >= start)
+    if end:
+        query = query.where(stats.c.day <= end)
+    by_day = [(d.isoformat(), n) for d, n in db.execute(query)]
+    return {"total": sum(n for _, n in by_day), "by_day": by_day}
+
+def main(argv=None):
+    from .database import SessionLocal
+    parser = argparse.ArgumentParser(description="Maintain the submission_daily_stats rollup")
+    sub = parser.add_subparsers(dest="command", required=True)
+    reconcile = sub.add_parser("reconcile", help="Recompute daily counts from submissions and repair drift")
+    reconcile.add_argument("--from", dest="start", type=date.fromisoformat)
+    reconcile.add_argument("--to", dest="end", type=date.fromisoformat)
+    args = parser.parse_args(argv)
+    with SessionLocal() as db:
+        drift = reconcile_daily_stats(db, args.start, args.end)
+    for d, (recorded, actual) in sorted(drift.items()):
+        print(f"{d}: {recorded} -> {actual}")
+    print(f"Reconciled {len(drift)} day(s)")
+
+if __name__ == "__main__":
+    main()
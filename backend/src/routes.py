@@ -1,43 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, File, UploadFile
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, File, UploadFile, Header
 from typing import List
-from . import crud, schemas, deps
+from datetime import date
+from . import crud, async_crud, schemas, deps, ingest, export, aws, etags, writequeue, idempotency
+from .database import DB_ASYNC
+from .deps import AnySession
 from .schemas import PaginatedSubmissions
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.security import OAuth2PasswordBearer
 from .auth import verify_password, get_password_hash, create_access_token, create_refresh_token, decode_token, oauth2_scheme
-import boto3
+from functools import lru_cache
 import os
-from sqlalchemy import func
 from .deps import limiter
 
 router = APIRouter(prefix="/api/submissions", tags=["submissions"])
 
-AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 S3_BUCKET = os.getenv("S3_BUCKET")
 SES_EMAIL_FROM = os.getenv("SES_EMAIL_FROM")
 SES_EMAIL_TO = os.getenv("SES_EMAIL_TO")
+# Reject blind overwrites: PUT must name the version it was based on
+REQUIRE_IF_MATCH = os.getenv("REQUIRE_IF_MATCH", "false").lower() in ("1", "true", "yes")
 
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION,
-)
-ses_client = boto3.client(
-    "ses",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION,
-)
+def conditional_response(etag: str, body: bytes) -> Response:
+    # body is None when If-None-Match matched: 304 with the validator and no payload
+    if body is None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 @router.get("/", response_model=PaginatedSubmissions)
-def list_submissions(
+async def list_submissions(
+    request: Request,
     skip: int = Query(0, description="Number of records to skip (offset)"),
     limit: int = Query(20, description="Number of records per page"),
     search: str = Query(None, description="Search by name or email"),
@@ -45,47 +39,141 @@ def list_submissions(
     preferred_contact: str = Query(None, description="Filter by preferred contact"),
     created_from: str = Query(None, description="Created from date (YYYY-MM-DD)"),
     created_to: str = Query(None, description="Created to date (YYYY-MM-DD)"),
-    sort_by: str = Query(None, description="Sort by field (created_at, full_name, age)"),
+    sort_by: str = Query(None, description="Sort by field (created_at, full_name, age, relevance)"),
     sort_order: str = Query("desc", description="Sort order (asc or desc)"),
-    db: Session = Depends(deps.get_db)
+    cursor: str = Query(None, description="Opaque cursor from a previous page's next_cursor (keyset pagination; skip is ignored)"),
+    count: str = Query("exact", description="Total count mode (exact, none, estimate, capped)"),
+    count_cap: int = Query(crud.COUNT_CAP, ge=1, description="Upper bound for count=capped"),
+    fields: str = Query(None, description="Comma-separated fields to return, e.g. full_name,email,created_at (id is always included)"),
+    db: AnySession = Depends(deps.get_read_session)
 ):
-    return crud.get_submissions(db, skip=skip, limit=limit, search=search, age=age, preferred_contact=preferred_contact, created_from=created_from, created_to=created_to, sort_by=sort_by, sort_order=sort_order)
+    # Rows come from the database (or the cache), so they are serialized directly instead of re-validating through response_model
+    etag, body = await async_crud.get_submissions_json(db, request.headers.get("if-none-match"), deps.use_cache(request), skip=skip, limit=limit, search=search, age=age, preferred_contact=preferred_contact, created_from=created_from, created_to=created_to, sort_by=sort_by, sort_order=sort_order, cursor=cursor, count=count, count_cap=count_cap, fields=crud.parse_fields(fields))
+    return conditional_response(etag, body)
+
+@router.get("/export")
+async def export_submissions(
+    format: str = Query("csv", description="Export format (csv or ndjson)"),
+    gzip: bool = Query(False, description="Gzip the stream"),
+    search: str = Query(None, description="Search by name or email"),
+    age: int = Query(None, description="Filter by age"),
+    preferred_contact: str = Query(None, description="Filter by preferred contact"),
+    created_from: str = Query(None, description="Created from date (YYYY-MM-DD)"),
+    created_to: str = Query(None, description="Created to date (YYYY-MM-DD)"),
+    sort_by: str = Query(None, description="Sort by field (created_at, full_name, age, relevance)"),
+    sort_order: str = Query("desc", description="Sort order (asc or desc)"),
+    replica=Depends(deps.read_replica),
+):
+    if format not in export.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    query = export.export_query(search=search, age=age, preferred_contact=preferred_contact, created_from=created_from, created_to=created_to, sort_by=sort_by, sort_order=sort_order)
+    return export.export_response(query, format, compress=gzip, use_async=DB_ASYNC, replica=replica)
 
 @router.get("/{submission_id}", response_model=schemas.SubmissionOut)
-def get_submission(submission_id: int, db: Session = Depends(deps.get_db)):
-    submission = crud.get_submission(db, submission_id)
-    if not submission:
+async def get_submission(
+    submission_id: int,
+    request: Request,
+    fields: str = Query(None, description="Comma-separated fields to return (id is always included)"),
+    db: AnySession = Depends(deps.get_read_session),
+):
+    etag, body = await async_crud.get_submission_json(db, submission_id, request.headers.get("if-none-match"), deps.use_cache(request), crud.parse_fields(fields))
+    if etag is None:
         raise HTTPException(status_code=404, detail="Submission not found")
-    return submission
+    return conditional_response(etag, body)
+
+async def create_response(db: AnySession, submission: schemas.SubmissionCreate) -> Response:
+    if writequeue.WRITE_MODE != "sync":
+        # Validated now, committed later in a batch; the receipt reports the outcome
+        receipt = await writequeue.enqueue(submission.model_dump())
+        status_url = f"/api/submissions/receipts/{receipt}"
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={"receipt": receipt, "status": "queued", "status_url": status_url}, headers={"Location": status_url})
+    created = await async_crud.create_submission(db, submission)
+    return Response(content=schemas.submission_json(created), status_code=status.HTTP_201_CREATED, media_type="application/json")
 
-@router.post("/", response_model=schemas.SubmissionOut, status_code=status.HTTP_201_CREATED)
-def create_submission(submission: schemas.SubmissionCreate, db: Session = Depends(deps.get_db)):
-    return crud.create_submission(db, submission)
+@router.post("/", response_model=schemas.SubmissionOut, status_code=status.HTTP_201_CREATED, dependencies=[Depends(deps.mark_write)])
+async def create_submission(submission: schemas.SubmissionCreate, request: Request, response: Response, idempotency_key: str = Header(None), db: AnySession = Depends(deps.get_session)):
+    # A retry with the same Idempotency-Key gets the first response back without a second insert
+    if idempotency_key:
+        return await idempotency.run(request, idempotency_key, lambda: create_response(db, submission), response)
+    result = await create_response(db, submission)
+    result.headers.raw.extend(response.headers.raw)
+    return result
 
-@router.put("/{submission_id}", response_model=schemas.SubmissionOut)
-def update_submission(submission_id: int, submission: schemas.SubmissionUpdate, db: Session = Depends(deps.get_db)):
-    updated = crud.update_submission(db, submission_id, submission)
+@router.get("/receipts/{receipt}", response_model=schemas.ReceiptStatus)
+async def get_receipt(receipt: str, db: AnySession = Depends(deps.get_session)):
+    # Primary, not a replica: the consumer has just written here
+    result = await deps.run_db(db, writequeue.get_receipt, receipt)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    return result
+
+async def bulk_response(request: Request, db: AnySession) -> Response:
+    # Accepts a JSON array, or NDJSON (one object per line) which is parsed as it streams in
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in ingest.NDJSON_CONTENT_TYPES:
+        chunks = ingest.ndjson_chunks(request.stream(), crud.BULK_BATCH_SIZE)
+    else:
+        try:
+            items = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        chunks = ingest.json_array_chunks(items, crud.BULK_BATCH_SIZE)
+    return JSONResponse(content=await ingest.ingest(db, chunks))
+
+@router.post("/bulk", response_model=schemas.BulkIngestResult, dependencies=[Depends(deps.mark_write)])
+async def bulk_create_submissions(request: Request, response: Response, idempotency_key: str = Header(None), db: AnySession = Depends(deps.get_session)):
+    # With an Idempotency-Key the body is read whole first so it can be hashed
+    if idempotency_key:
+        return await idempotency.run(request, idempotency_key, lambda: bulk_response(request, db), response)
+    result = await bulk_response(request, db)
+    result.headers.raw.extend(response.headers.raw)
+    return result
+
+def check_if_match(request: Request):
+    if_match = request.headers.get("if-match")
+    if REQUIRE_IF_MATCH and not if_match:
+        raise HTTPException(status_code=428, detail="If-Match header required; send the ETag from your last GET")
+    return if_match
+
+@router.put("/{submission_id}", response_model=schemas.SubmissionOut, dependencies=[Depends(deps.mark_write)])
+async def update_submission(submission_id: int, submission: schemas.SubmissionUpdate, response: Response, if_match: str = Depends(check_if_match), db: AnySession = Depends(deps.get_session)):
+    updated = await async_crud.update_submission(db, submission_id, submission, if_match)
     if not updated:
         raise HTTPException(status_code=404, detail="Submission not found")
+    response.headers["ETag"] = etags.submission_etag(updated.id, updated.version)
     return updated
 
-@router.delete("/{submission_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_submission(submission_id: int, db: Session = Depends(deps.get_db)):
-    deleted = crud.delete_submission(db, submission_id)
+@router.patch("/{submission_id}", response_model=schemas.SubmissionOut, dependencies=[Depends(deps.mark_write)])
+async def patch_submission(submission_id: int, patch: schemas.SubmissionPatch, response: Response, if_match: str = Depends(check_if_match), db: AnySession = Depends(deps.get_session)):
+    # Only the fields in the body are validated and written
+    updated = await async_crud.patch_submission(db, submission_id, patch, if_match)
+    if not updated:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    response.headers["ETag"] = etags.submission_etag(updated.id, updated.version)
+    return updated
+
+@router.delete("/{submission_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(deps.mark_write)])
+async def delete_submission(submission_id: int, db: AnySession = Depends(deps.get_session)):
+    deleted = await async_crud.delete_submission(db, submission_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="Submission not found")
     return None
 
-# Dummy user for demonstration
-fake_user = {
-    "username": "testuser",
-    "hashed_password": get_password_hash("testpass")
-}
+# Dummy user for demonstration; hashed on first login rather than at import
+@lru_cache(maxsize=None)
+def get_fake_user():
+    return {
+        "username": "testuser",
+        "hashed_password": get_password_hash("testpass")
+    }
 
 @router.post("/api/auth/token")
 def login(form_data: dict = Body(...)):
     username = form_data.get("username")
     password = form_data.get("password")
+    fake_user = get_fake_user()
     if username != fake_user["username"] or not verify_password(password, fake_user["hashed_password"]):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     access_token = create_access_token({"sub": username})
@@ -113,11 +201,11 @@ def limited_endpoint(request: Request):
 @router.post("/api/upload")
 def upload_file(file: UploadFile = File(...)):
     key = f"uploads/{file.filename}"
-    s3_client.upload_fileobj(file.file, S3_BUCKET, key)
-    file_url = f"https://{S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{key}"
+    aws.get_client("s3").upload_fileobj(file.file, S3_BUCKET, key)
+    file_url = f"https://{S3_BUCKET}.s3.{aws.AWS_REGION}.amazonaws.com/{key}"
     # Send email notification
     if SES_EMAIL_FROM and SES_EMAIL_TO:
-        ses_client.send_email(
+        aws.get_client("ses").send_email(
             Source=SES_EMAIL_FROM,
             Destination={"ToAddresses": [SES_EMAIL_TO]},
             Message={
@@ -128,8 +216,10 @@ def upload_file(file: UploadFile = File(...)):
     return {"file_url": file_url}
 
 @router.get("/api/analytics")
-def get_analytics(db: Session = Depends(deps.get_db)):
-    from .models import Submission
-    total = db.query(Submission).count()
-    by_day = db.query(func.date(Submission.created_at), func.count()).group_by(func.date(Submission.created_at)).all()
-    return {"total": total, "by_day": by_day} 
\ No newline at end of file
+async def get_analytics(
+    request: Request,
+    start: date = Query(None, description="First day to include (YYYY-MM-DD)"),
+    end: date = Query(None, description="Last day to include (YYYY-MM-DD)"),
+    db: AnySession = Depends(deps.get_read_session),
+):
+    return await async_crud.get_analytics(db, start, end, deps.use_cache(request)) 
\ No newline at end of file
@@ -1,8 +1,43 @@
-from pydantic import BaseModel, EmailStr, constr, conint, validator
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, EmailStr, constr, conint, create_model, validator
+from functools import lru_cache
+from typing import Optional, List, Literal
 from datetime import datetime
 import re
-import bleach
+
+def clean_html(value: str) -> str:
+    # bleach is imported on the first write, not at cold start
+    import bleach
+    return bleach.clean(value, strip=True)
+
+# Field checks shared by the full (POST/PUT) and partial (PATCH) write models
+def check_full_name(v):
+    v = clean_html(v)
+    if not re.match(r"^[A-Za-z\s\.'-]+$", v):
+        raise ValueError("Full name contains invalid characters")
+    return v
+
+def check_phone_number(v):
+    v = clean_html(v)
+    # Simple international phone regex, adjust as needed
+    if not re.match(r"^\+?\d{7,20}$", v):
+        raise ValueError("Invalid phone number format")
+    return v
+
+def check_address(v):
+    if v:
+        return clean_html(v)
+    return v
+
+def check_preferred_contact(v):
+    v = clean_html(v)
+    if v not in ('Email', 'Phone', 'Both'):
+        raise ValueError("preferred_contact must be 'Email', 'Phone', or 'Both'")
+    return v
+
+def check_not_null(v):
+    if v is None:
+        raise ValueError("may not be null")
+    return v
 
 class SubmissionBase(BaseModel):
     full_name: constr(strip_whitespace=True, min_length=1, max_length=255)
@@ -14,36 +49,24 @@ class SubmissionBase(BaseModel):
 
     @validator('full_name')
     def sanitize_full_name(cls, v):
-        v = bleach.clean(v, strip=True)
-        if not re.match(r"^[A-Za-z\s\.'-]+$", v):
-            raise ValueError("Full name contains invalid characters")
-        return v
+        return check_full_name(v)
 
     @validator('email')
     def sanitize_email(cls, v):
-        v = bleach.clean(v, strip=True)
+        v = clean_html(v)
         return v
 
     @validator('phone_number')
     def validate_phone_number(cls, v):
-        v = bleach.clean(v, strip=True)
-        # Simple international phone regex, adjust as needed
-        if not re.match(r"^\+?\d{7,20}$", v):
-            raise ValueError("Invalid phone number format")
-        return v
+        return check_phone_number(v)
 
     @validator('address')
     def sanitize_address(cls, v):
-        if v:
-            return bleach.clean(v, strip=True)
-        return v
+        return check_address(v)
 
     @validator('preferred_contact')
     def sanitize_preferred_contact(cls, v):
-        v = bleach.clean(v, strip=True)
-        if v not in ('Email', 'Phone', 'Both'):
-            raise ValueError("preferred_contact must be 'Email', 'Phone', or 'Both'")
-        return v
+        return check_preferred_contact(v)
 
 class SubmissionCreate(SubmissionBase):
     pass
@@ -51,14 +74,107 @@ class SubmissionCreate(SubmissionBase):
 class SubmissionUpdate(SubmissionBase):
     pass
 
-class SubmissionOut(SubmissionBase):
+# PATCH body: every field optional. Validators only run for the fields that were sent,
+# so a phone-number edit doesn't re-sanitize the name, address and email.
+class SubmissionPatch(BaseModel):
+    full_name: Optional[constr(strip_whitespace=True, min_length=1, max_length=255)] = None
+    email: Optional[EmailStr] = None
+    phone_number: Optional[constr(strip_whitespace=True, min_length=7, max_length=20)] = None
+    age: Optional[conint(ge=18, le=120)] = None
+    address: Optional[str] = None
+    preferred_contact: Optional[constr(strip_whitespace=True)] = None
+
+    @validator('full_name')
+    def sanitize_full_name(cls, v):
+        return check_full_name(check_not_null(v))
+
+    @validator('email')
+    def sanitize_email(cls, v):
+        return clean_html(check_not_null(v))
+
+    @validator('phone_number')
+    def validate_phone_number(cls, v):
+        return check_phone_number(check_not_null(v))
+
+    @validator('age')
+    def validate_age(cls, v):
+        return check_not_null(v)
+
+    @validator('address')
+    def sanitize_address(cls, v):
+        return check_address(v)
+
+    @validator('preferred_contact')
+    def sanitize_preferred_contact(cls, v):
+        return check_preferred_contact(check_not_null(v))
+
+    def changes(self) -> dict:
+        # Only the fields the client sent; an explicit null clears address
+        return self.dict(exclude_unset=True)
+
+# Read model: rows were sanitized when they were written, so this carries no
+# validators and is built straight from ORM rows without re-running bleach.
+class SubmissionOut(BaseModel):
     id: int
+    full_name: str
+    email: str
+    phone_number: str
+    age: int
+    address: Optional[str] = None
+    preferred_contact: str
     created_at: datetime
     updated_at: datetime
+    version: int
 
     class Config:
         from_attributes = True
 
 class PaginatedSubmissions(BaseModel):
-    total: int
-    items: List[SubmissionOut] 
\ No newline at end of file
+    # None when count=none; total_kind says whether total is exact, an estimate or a lower bound (capped)
+    total: Optional[int] = None
+    total_kind: Literal["exact", "estimate", "capped", "none"] = "exact"
+    items: List[SubmissionOut]
+    next_cursor: Optional[str] = None
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: Literal["created", "duplicate", "invalid"]
+    id: Optional[int] = None
+    errors: Optional[List[dict]] = None
+
+class BulkIngestResult(BaseModel):
+    created: int
+    duplicate: int
+    invalid: int
+    elapsed_ms: float
+    rows_per_second: float
+    items: List[BulkItemResult]
+
+class ReceiptStatus(BaseModel):
+    # queued, created, duplicate (the email was already taken when the batch committed) or
+    # failed (the batch could not be committed)
+    receipt: str
+    status: str
+    submission_id: Optional[int] = None
+    detail: Optional[str] = None
+
+# Narrowed read models for ?fields=, built once per distinct field set
+@lru_cache(maxsize=128)
+def projected_models(fields: tuple):
+    item = create_model(
+        "SubmissionOut_" + "_".join(fields),
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (SubmissionOut.model_fields[name].annotation, SubmissionOut.model_fields[name]) for name in fields},
+    )
+    page = create_model("PaginatedSubmissions_" + "_".join(fields), __base__=PaginatedSubmissions, items=(List[item], ...))
+    return item, page
+
+# The read models have no validators, so from_attributes validation is a plain copy
+# done inside pydantic-core; serialize straight to JSON bytes from there.
+def submission_json(row, fields: tuple = None) -> bytes:
+    model = projected_models(fields)[0] if fields else SubmissionOut
+    return model.__pydantic_serializer__.to_json(model.model_validate(row))
+
+def submissions_page_json(page: dict, fields: tuple = None) -> bytes:
+    model = projected_models(fields)[1] if fields else PaginatedSubmissions
+    return model.__pydantic_serializer__.to_json(model.model_validate(page))
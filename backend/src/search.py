@@ -0,0 +1,77 @@
+import os
+from sqlalchemy import DDL, event, or_, func, cast, select, literal_column, table, column
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
+from .models import Submission
+
+# "auto" picks the indexed backend for the connected database, "like" forces plain ILIKE scans
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+# The SQLite trigram tokenizer cannot match terms shorter than three characters
+FTS_MIN_TERM_LENGTH = 3
+
+submissions_fts = table("submissions_fts", column("rowid"), column("rank"))
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE submissions ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS "
+    "(to_tsvector('simple', coalesce(full_name, '') || ' ' || coalesce(email, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_submissions_search_vector ON submissions USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_submissions_full_name_trgm ON submissions USING gin (full_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_submissions_email_trgm ON submissions USING gin (email gin_trgm_ops)",
+]
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS submissions_fts USING fts5("
+    "full_name, email, content='submissions', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS submissions_fts_ai AFTER INSERT ON submissions BEGIN "
+    "INSERT INTO submissions_fts(rowid, full_name, email) VALUES (new.id, new.full_name, new.email); END",
+    "CREATE TRIGGER IF NOT EXISTS submissions_fts_ad AFTER DELETE ON submissions BEGIN "
+    "INSERT INTO submissions_fts(submissions_fts, rowid, full_name, email) VALUES ('delete', old.id, old.full_name, old.email); END",
+    "CREATE TRIGGER IF NOT EXISTS submissions_fts_au AFTER UPDATE OF full_name, email ON submissions BEGIN "
+    "INSERT INTO submissions_fts(submissions_fts, rowid, full_name, email) VALUES ('delete', old.id, old.full_name, old.email); "
+    "INSERT INTO submissions_fts(rowid, full_name, email) VALUES (new.id, new.full_name, new.email); END",
+]
+
+# Keep Base.metadata.create_all() in step with the 0002 migration
+for statement in POSTGRES_DDL:
+    event.listen(Submission.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in SQLITE_DDL:
+    event.listen(Submission.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Submission.__table__, "before_drop", DDL("DROP TABLE IF EXISTS submissions_fts").execute_if(dialect="sqlite"))
+
+def _like_search(term: str):
+    return or_(Submission.full_name.ilike(f"%{term}%"), Submission.email.ilike(f"%{term}%")), None
+
+def _postgres_search(term: str):
+    search_vector = literal_column("submissions.search_vector")
+    query = func.plainto_tsquery("simple", term)
+    condition = or_(
+        search_vector.op("@@")(query),
+        Submission.full_name.ilike(f"%{term}%"),
+        Submission.email.ilike(f"%{term}%"),
+        Submission.full_name.op("%")(term),
+    )
+    # ts_rank and similarity return real; widen so cursor values round-trip exactly
+    rank = cast(
+        func.ts_rank(search_vector, query) + func.greatest(func.similarity(Submission.full_name, term), func.similarity(Submission.email, term)),
+        DOUBLE_PRECISION,
+    )
+    return condition, rank
+
+def _sqlite_search(term: str):
+    if len(term) < FTS_MIN_TERM_LENGTH:
+        return _like_search(term)
+    phrase = '"' + term.replace('"', '""') + '"'
+    match = literal_column("submissions_fts").op("MATCH")(phrase)
+    condition = Submission.id.in_(select(submissions_fts.c.rowid).where(match))
+    # bm25 ranks are negative, lower is better; flip the sign so higher always means more relevant
+    rank = -select(submissions_fts.c.rank).where(match, submissions_fts.c.rowid == Submission.id).scalar_subquery()
+    return condition, rank
+
+def search_clause(dialect_name: str, term: str):
+    if SEARCH_BACKEND == "like":
+        return _like_search(term)
+    if dialect_name == "postgresql":
+        return _postgres_search(term)
+    if dialect_name == "sqlite":
+        return _sqlite_search(term)
+    return _like_search(term)
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+# Identical reads in flight at the same time share one execution: the first caller (the
+# leader) runs it, the rest wait for its result. SINGLEFLIGHT_GRACE_MS > 0 also hands that
+# result to identical requests arriving shortly after; any write in this process ends it early.
+# A write also starts a new generation: requests arriving after it never join a flight that
+# began before it, since that read may have missed the write.
+SINGLEFLIGHT = os.getenv("SINGLEFLIGHT", "true").lower() in ("1", "true", "yes")
+SINGLEFLIGHT_GRACE_MS = int(os.getenv("SINGLEFLIGHT_GRACE_MS", "0"))
+
+def key(name: str, params: dict) -> str:
+    # Same parameters in any order, with defaults spelled out or not, share a flight
+    return name + ":" + json.dumps({k: v for k, v in params.items() if v not in (None, "")}, sort_keys=True, default=str)
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, grace_ms: int = SINGLEFLIGHT_GRACE_MS, enabled: bool = SINGLEFLIGHT, clock=time.monotonic):
+        self.grace = grace_ms / 1000
+        self.enabled = enabled
+        self.clock = clock
+        self.stats = {"executed": 0, "shared": 0}
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._futures = {}
+        self._recent = {}
+        self._generation = 0
+
+    def _recent_value(self, key):
+        # Caller holds the lock
+        entry = self._recent.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] <= self.clock():
+            del self._recent[key]
+            return False, None
+        return True, entry[1]
+
+    def _finish(self, key, generation, value):
+        # Caller holds the lock. A result from before the latest write is not reused.
+        self.stats["executed"] += 1
+        if self.grace > 0 and generation == self._generation:
+            self._recent[key] = (self.clock() + self.grace, value)
+
+    def do(self, key, fn):
+        # Threads (sync routes, scripts): followers block on the leader's Event
+        if not self.enabled:
+            return fn()
+        with self._lock:
+            found, value = self._recent_value(key)
+            if found:
+                self.stats["shared"] += 1
+                return value
+            flight = (self._generation, key)
+            call = self._calls.get(flight)
+            leader = call is None
+            if leader:
+                call = self._calls[flight] = _Call()
+            else:
+                self.stats["shared"] += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[flight]
+                if call.error is None:
+                    self._finish(key, flight[0], call.value)
+            call.event.set()
+        return call.value
+
+    async def ado(self, key, fn):
+        # Coroutines: fn() returns an awaitable; followers await the leader's Future
+        if not self.enabled:
+            return await fn()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            found, value = self._recent_value(key)
+            if found:
+                self.stats["shared"] += 1
+                return value
+            flight = (self._generation, key)
+            future = self._futures.get(flight)
+            # A future from another event loop (tests, multiple loops) cannot be awaited here
+            leader = future is None or future.get_loop() is not loop
+            if leader:
+                future = loop.create_future()
+                self._futures[flight] = future
+            else:
+                self.stats["shared"] += 1
+        if not leader:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leader's client went away; run it again (one of the followers leads)
+                return await self.ado(key, fn)
+        try:
+            value = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark it retrieved: with no followers nobody else will
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            with self._lock:
+                self._finish(key, flight[0], value)
+            return value
+        finally:
+            with self._lock:
+                if self._futures.get(flight) is future:
+                    del self._futures[flight]
+
+    def expire(self):
+        # Called after writes: the next read runs instead of reusing a result from before
+        # it, or joining a flight that started before it
+        with self._lock:
+            self._generation += 1
+            self._recent.clear()
+
+
+# Shared by the read routes
+reads = SingleFlight()
@@ -0,0 +1,234 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, insert
+from sqlalchemy.orm import Session
+from . import aws, crud, cache
+from .models import SubmissionReceipt
+
+# sync: POST commits before answering (default). queue: POST answers 202 with a receipt and an
+# in-process consumer group-commits the queue. sqs: POST sends to WRITE_QUEUE_URL and the Lambda
+# handler commits each SQS batch.
+WRITE_MODE = os.getenv("WRITE_MODE", "sync")
+WRITE_QUEUE_URL = os.getenv("WRITE_QUEUE_URL")
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "500"))
+# How long the consumer waits for a batch to fill once it has one row
+WRITE_LINGER_MS = int(os.getenv("WRITE_LINGER_MS", "50"))
+# Rows waiting in memory before POST answers 503; they are lost if the process dies
+WRITE_QUEUE_MAX = int(os.getenv("WRITE_QUEUE_MAX", "10000"))
+# A well-formed receipt younger than this with no outcome yet is reported as queued (it may
+# be in SQS or on another worker); older or malformed ones are unknown (404)
+RECEIPT_PENDING_SECONDS = int(os.getenv("RECEIPT_PENDING_SECONDS", "900"))
+# A batch that fails this many times in a row has its receipts marked failed
+WRITE_MAX_ATTEMPTS = int(os.getenv("WRITE_MAX_ATTEMPTS", "5"))
+WRITE_RETRY_DELAY = 1.0
+
+receipts = SubmissionReceipt.__table__
+
+def new_receipt() -> str:
+    # Millisecond timestamp then randomness: sortable, and its age is readable without a lookup
+    return f"{int(time.time() * 1000):012x}{uuid.uuid4().hex[:20]}"
+
+def receipt_age(receipt: str):
+    # Seconds since the receipt was issued; None when it is not one new_receipt() made
+    if len(receipt) != 32:
+        return None
+    try:
+        int(receipt, 16)
+    except ValueError:
+        return None
+    return time.time() - int(receipt[:12], 16) / 1000
+
+def commit_batch(db: Session, items: list):
+    # items: [(receipt, values)]. One transaction inserts the submissions and their receipts;
+    # redelivered receipts are skipped and a repeated email within the batch loses to the first.
+    ids = [receipt for receipt, _ in items]
+    done = set(db.execute(select(receipts.c.id).where(receipts.c.id.in_(ids))).scalars())
+    batch, outcomes, seen = [], [], set()
+    for receipt, values in items:
+        if receipt in done:
+            continue
+        done.add(receipt)
+        if values["email"] in seen:
+            outcomes.append({"id": receipt, "status": "duplicate", "submission_id": None, "email": values["email"], "detail": "Duplicate email"})
+            continue
+        seen.add(values["email"])
+        batch.append((receipt, values))
+    inserted = crud.insert_submission_rows(db, [values for _, values in batch]) if batch else {}
+    for receipt, values in batch:
+        if values["email"] in inserted:
+            outcomes.append({"id": receipt, "status": "created", "submission_id": inserted[values["email"]], "email": values["email"], "detail": None})
+        else:
+            outcomes.append({"id": receipt, "status": "duplicate", "submission_id": None, "email": values["email"], "detail": "Duplicate email"})
+    if outcomes:
+        db.execute(insert(receipts), outcomes)
+    db.commit()
+    if inserted:
+        crud.clear_count_cache()
+        cache.invalidate_lists()
+    return outcomes
+
+def commit_items(items: list):
+    from .database import SessionLocal
+    with SessionLocal() as db:
+        return commit_batch(db, items)
+
+def fail_items(items: list, detail: str):
+    from .database import SessionLocal
+    with SessionLocal() as db:
+        db.execute(insert(receipts), [{"id": receipt, "status": "failed", "submission_id": None, "email": values["email"], "detail": detail} for receipt, values in items])
+        db.commit()
+
+def get_receipt(db: Session, receipt: str):
+    row = db.execute(select(receipts).where(receipts.c.id == receipt)).mappings().one_or_none()
+    if row is not None:
+        return {"receipt": receipt, "status": row["status"], "submission_id": row["submission_id"], "detail": row["detail"]}
+    if write_queue is not None and receipt in write_queue.failed:
+        return {"receipt": receipt, "status": "failed", "submission_id": None, "detail": write_queue.failed[receipt]}
+    # Held here, or recent enough to still be in SQS or another worker's queue. A few
+    # seconds of clock skew between instances is allowed.
+    age = receipt_age(receipt)
+    if (write_queue is not None and receipt in write_queue.pending) or (age is not None and -5 <= age < RECEIPT_PENDING_SECONDS):
+        return {"receipt": receipt, "status": "queued", "submission_id": None, "detail": None}
+    return None
+
+
+class WriteQueue:
+    def __init__(self, max_size: int = WRITE_QUEUE_MAX, batch_size: int = WRITE_BATCH_SIZE, linger_ms: int = WRITE_LINGER_MS,
+                 max_attempts: int = WRITE_MAX_ATTEMPTS, retry_delay: float = WRITE_RETRY_DELAY):
+        self.queue = asyncio.Queue(max_size)
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.pending = set()
+        # receipt -> detail for batches whose failure could not be written to the table either
+        self.failed = {}
+        # Rows taken off the queue but not yet flushed, and the flush in progress: stop()
+        # finishes both instead of losing them to the cancellation
+        self.batch = []
+        self.flushing = None
+        self.task = None
+
+    def put(self, receipt: str, values: dict):
+        try:
+            self.queue.put_nowait((receipt, values))
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=503, detail="Write queue is full, retry shortly", headers={"Retry-After": "1"})
+        self.pending.add(receipt)
+
+    async def next_batch(self):
+        self.batch.append(await self.queue.get())
+        deadline = time.monotonic() + self.linger
+        while len(self.batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                self.batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        items, self.batch = self.batch, []
+        return items
+
+    async def flush(self, items: list):
+        # Retried in place, so a failing batch holds up the queue (POST answers 503 once it
+        # is full) rather than cycling through it; after max_attempts its receipts fail
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await run_in_threadpool(commit_items, items)
+                break
+            except Exception as e:
+                print(f"Write batch of {len(items)} failed (attempt {attempt} of {self.max_attempts}): {e}")
+                if attempt < self.max_attempts:
+                    await asyncio.sleep(self.retry_delay * attempt)
+        else:
+            await self.fail(items, "Could not be saved, submit it again")
+        self.pending.difference_update(receipt for receipt, _ in items)
+
+    async def fail(self, items: list, detail: str):
+        try:
+            await run_in_threadpool(fail_items, items, detail)
+        except Exception as e:
+            print(f"Could not record {len(items)} failed receipt(s): {e}")
+            self.failed.update((receipt, detail) for receipt, _ in items)
+
+    async def run(self):
+        while True:
+            items = await self.next_batch()
+            self.flushing = asyncio.ensure_future(self.flush(items))
+            await asyncio.shield(self.flushing)
+            self.flushing = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        # Commit whatever is still queued before the process exits
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        if self.flushing is not None:
+            await self.flushing
+        items, self.batch = self.batch, []
+        items.extend(self.queue.get_nowait() for _ in range(self.queue.qsize()))
+        for i in range(0, len(items), self.batch_size):
+            await self.flush(items[i:i + self.batch_size])
+
+
+write_queue = None
+
+async def start():
+    global write_queue
+    if WRITE_MODE == "queue" and write_queue is None:
+        write_queue = WriteQueue()
+        write_queue.start()
+
+async def stop():
+    global write_queue
+    if write_queue is not None:
+        await write_queue.stop()
+        write_queue = None
+
+async def enqueue(values: dict) -> str:
+    receipt = new_receipt()
+    if WRITE_MODE == "sqs":
+        body = json.dumps({"receipt": receipt, "values": values})
+        await run_in_threadpool(aws.get_client("sqs").send_message, QueueUrl=WRITE_QUEUE_URL, MessageBody=body)
+    elif write_queue is None:
+        raise HTTPException(status_code=503, detail="Write queue is not running")
+    else:
+        write_queue.put(receipt, values)
+    return receipt
+
+def handle_sqs(event: dict):
+    # One SQS batch, one transaction. If it fails, each message is retried in its own
+    # transaction and only the ones that still fail (or cannot be read) are reported back
+    # for SQS to redeliver; receipts already committed are skipped on the retry.
+    messages, failures = [], []
+    for record in event["Records"]:
+        try:
+            body = json.loads(record["body"])
+            messages.append((record["messageId"], (body["receipt"], body["values"])))
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Unreadable message {record['messageId']}: {e}")
+            failures.append(record["messageId"])
+    try:
+        outcomes = commit_items([item for _, item in messages]) if messages else []
+    except Exception as e:
+        print(f"Write batch of {len(messages)} failed, retrying one at a time: {e}")
+        outcomes = []
+        for message_id, item in messages:
+            try:
+                outcomes.extend(commit_items([item]))
+            except Exception as e:
+                print(f"Message {message_id} failed: {e}")
+                failures.append(message_id)
+    print(f"Committed {sum(1 for outcome in outcomes if outcome['status'] == 'created')} of {len(event['Records'])} queued submission(s)")
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failures]}
@@ -0,0 +1,104 @@
+import os
+from dotenv import load_dotenv
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../.env'))
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from datetime import datetime
+import pytest
+from sqlalchemy import select, delete
+from src import archive, crud, main
+from src.database import SessionLocal
+from src.models import Submission
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    local = archive.LocalStore(str(tmp_path))
+    monkeypatch.setattr(archive, "get_store", lambda: local)
+    yield local
+    with SessionLocal() as db:
+        db.execute(delete(archive.rehydrations))
+        db.execute(delete(archive.manifest))
+        db.commit()
+        # Through crud so the daily rollup stays in step for the analytics tests
+        for submission_id in db.execute(select(Submission.id).where(Submission.email.like("%@archive.example.com"))).scalars().all():
+            crud.delete_submission(db, submission_id)
+
+def old_rows(n):
+    return [
+        {"full_name": f"Old User {i}", "email": f"old{i}@archive.example.com", "phone_number": "+1234567890", "age": 50,
+         "address": "4 Cold St", "preferred_contact": "Email", "created_at": datetime(2020, 1, i + 1), "updated_at": datetime(2020, 1, i + 1)}
+        for i in range(n)
+    ]
+
+def archived_emails(db):
+    return db.execute(select(Submission.email).where(Submission.email.like("%@archive.example.com"))).scalars().all()
+
+def test_archive_moves_old_rows_in_batches(store):
+    with SessionLocal() as db:
+        crud.bulk_insert_submissions(db, old_rows(5))
+        entries = archive.archive_old_submissions(db, older_than_days=90, batch_size=2)
+        assert [entry["row_count"] for entry in entries] == [2, 2, 1]
+        assert archived_emails(db) == []
+        assert entries[0]["object_key"] == f"{archive.ARCHIVE_PREFIX}2020/01/{entries[0]['first_id']}-{entries[0]['last_id']}.ndjson.gz"
+        found = list(archive.query_archive(db, created_from=datetime(2020, 1, 2), created_to=datetime(2020, 1, 3)))
+        assert [row["email"] for row in found] == ["old1@archive.example.com", "old2@archive.example.com"]
+
+def test_rehydrate_restores_original_ids(store):
+    with SessionLocal() as db:
+        ids = crud.bulk_insert_submissions(db, old_rows(2))
+        entry = archive.archive_old_submissions(db, older_than_days=90)[0]
+        archive_id = db.execute(select(archive.manifest.c.id).where(archive.manifest.c.object_key == entry["object_key"])).scalar_one()
+        assert archive.rehydrate(db, archive_id) == (2, 0)
+        restored = dict(db.execute(select(Submission.email, Submission.id).where(Submission.email.like("%@archive.example.com"))).all())
+        assert restored == ids
+        assert archive.rehydrate(db, archive_id) is None
+
+def test_rehydrated_rows_survive_the_next_run(store):
+    with SessionLocal() as db:
+        crud.bulk_insert_submissions(db, old_rows(2))
+        entry = archive.archive_old_submissions(db, older_than_days=90)[0]
+        archive_id = db.execute(select(archive.manifest.c.id).where(archive.manifest.c.object_key == entry["object_key"])).scalar_one()
+        archive.rehydrate(db, archive_id)
+        # Still older than the cutoff, but rehydrated: the next scheduled run leaves them be
+        crud.bulk_insert_submissions(db, old_rows(3)[2:])
+        assert [entry["row_count"] for entry in archive.archive_old_submissions(db, older_than_days=90)] == [1]
+        assert sorted(archived_emails(db)) == ["old0@archive.example.com", "old1@archive.example.com"]
+
+def test_rehydrated_rows_are_archived_again_after_retention(store):
+    with SessionLocal() as db:
+        crud.bulk_insert_submissions(db, old_rows(2))
+        first = archive.archive_old_submissions(db, older_than_days=90)[0]
+        archive_id = db.execute(select(archive.manifest.c.id).where(archive.manifest.c.object_key == first["object_key"])).scalar_one()
+        archive.rehydrate(db, archive_id)
+        again = archive.archive_old_submissions(db, older_than_days=90, retention_days=0)
+        assert [entry["row_count"] for entry in again] == [2]
+        assert archived_emails(db) == [] and db.execute(select(archive.rehydrations)).all() == []
+        # The superseded batch is not read as well
+        assert sorted(row["email"] for row in archive.query_archive(db)) == ["old0@archive.example.com", "old1@archive.example.com"]
+
+def test_failed_rehydrate_restores_nothing(store, monkeypatch):
+    with SessionLocal() as db:
+        crud.bulk_insert_submissions(db, old_rows(2))
+        entry = archive.archive_old_submissions(db, older_than_days=90)[0]
+        archive_id = db.execute(select(archive.manifest.c.id).where(archive.manifest.c.object_key == entry["object_key"])).scalar_one()
+    original = crud.insert_submission_rows
+    def fail_second_batch(db, rows):
+        if rows[0]["email"] == "old1@archive.example.com":
+            raise RuntimeError("connection lost")
+        return original(db, rows)
+    monkeypatch.setattr(crud, "BULK_BATCH_SIZE", 1)
+    monkeypatch.setattr(crud, "insert_submission_rows", fail_second_batch)
+    with SessionLocal() as db:
+        with pytest.raises(RuntimeError):
+            archive.rehydrate(db, archive_id)
+    with SessionLocal() as db:
+        assert archived_emails(db) == []
+        assert db.execute(select(archive.manifest.c.rehydrated_at).where(archive.manifest.c.id == archive_id)).scalar_one() is None
+
+def test_scheduled_event_runs_archive(store):
+    class Context:
+        def get_remaining_time_in_millis(self):
+            return 60000
+    with SessionLocal() as db:
+        crud.bulk_insert_submissions(db, old_rows(3))
+    assert main.handler({"task": "archive", "batch_size": 2}, Context()) == {"batches": 2, "rows": 3}
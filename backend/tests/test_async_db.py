@@ -0,0 +1,64 @@
+import os
+from dotenv import load_dotenv
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../.env'))
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import NullPool
+from src.main import app
+from src import cache, deps
+from src.database import Base, async_database_url
+
+client = TestClient(app)
+
+@pytest.fixture
+def async_db(tmp_path):
+    url = f"sqlite:///{tmp_path}/async.db"
+    Base.metadata.create_all(bind=create_engine(url))
+    # TestClient runs each request on a fresh event loop, so don't pool connections across them
+    async_engine = create_async_engine(async_database_url(url), poolclass=NullPool)
+    AsyncTestingSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    sessions = []
+
+    async def override_get_session():
+        async with AsyncTestingSession() as db:
+            sessions.append(db)
+            yield db
+
+    # Entries cached from the main test database would shadow this one's rows
+    cache.clear()
+    app.dependency_overrides[deps.get_session] = override_get_session
+    app.dependency_overrides[deps.get_read_session] = override_get_session
+    yield sessions
+    app.dependency_overrides.pop(deps.get_session)
+    app.dependency_overrides.pop(deps.get_read_session)
+
+def test_async_database_url():
+    assert async_database_url("postgresql+psycopg2://u:p@db:5432/formdb") == "postgresql+asyncpg://u:p@db:5432/formdb"
+    assert async_database_url("sqlite:////tmp/app.db") == "sqlite+aiosqlite:////tmp/app.db"
+
+def test_crud_over_async_session(async_db):
+    payload = {
+        "full_name": "Async User",
+        "email": "async@example.com",
+        "phone_number": "+1234567890",
+        "age": 30,
+        "address": "1 Loop St",
+        "preferred_contact": "Both"
+    }
+    resp = client.post("/api/submissions/", json=payload)
+    assert resp.status_code == 201, resp.text
+    submission_id = resp.json()["id"]
+    assert client.post("/api/submissions/", json=payload).status_code == 400
+    data = client.get("/api/submissions/?search=Async").json()
+    assert data["total"] == 1 and data["items"][0]["id"] == submission_id
+    assert client.get(f"/api/submissions/{submission_id}").json()["email"] == payload["email"]
+    resp = client.put(f"/api/submissions/{submission_id}", json={**payload, "age": 31})
+    assert resp.status_code == 200 and resp.json()["age"] == 31
+    assert client.get("/api/submissions/api/analytics").json()["total"] == 1
+    assert client.delete(f"/api/submissions/{submission_id}").status_code == 204
+    assert client.get(f"/api/submissions/{submission_id}").status_code == 404
+    assert async_db and all(isinstance(db, AsyncSession) for db in async_db)
@@ -0,0 +1,119 @@
+import os
+from dotenv import load_dotenv
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../.env'))
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import fnmatch
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from src.main import app
+from src import cache
+from src.database import engine as app_engine
+
+client = TestClient(app)
+
+class FakeRedis:
+    # The subset of redis-py that RedisCache uses, with values stored as bytes like the real client
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode() if isinstance(value, str) else value
+        self.expiry[key] = ex
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        return [key for key in list(self.data) if fnmatch.fnmatch(key, match)]
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request, monkeypatch):
+    fake = FakeRedis()
+    backend = cache.MemoryCache() if request.param == "memory" else cache.RedisCache(fake, prefix="test:")
+    monkeypatch.setattr(cache, "get_cache", lambda: backend)
+    yield backend
+
+@pytest.fixture
+def statements():
+    recorded = []
+    def record(conn, cursor, statement, *args):
+        recorded.append(statement.split()[0].upper())
+    event.listen(app_engine, "before_cursor_execute", record)
+    yield recorded
+    event.remove(app_engine, "before_cursor_execute", record)
+
+def payload(email):
+    return {"full_name": "Cached User", "email": email, "phone_number": "+1234567890", "age": 41, "address": "2 Cache Rd", "preferred_contact": "Phone"}
+
+def test_memory_cache_lru_and_ttl():
+    now = [0.0]
+    memory = cache.MemoryCache(max_entries=2, clock=lambda: now[0])
+    memory.set("a", b"1", ttl=10)
+    memory.set("b", b"2", ttl=10)
+    memory.get("a")
+    memory.set("c", b"3", ttl=10)
+    assert memory.get("b") is None and memory.get("a") == b"1"
+    now[0] = 11
+    assert memory.get("a") is None
+
+def test_redis_cache_prefixes_and_expires():
+    fake = FakeRedis()
+    redis_cache = cache.RedisCache(fake, prefix="app:")
+    redis_cache.set("k", b"v", ttl=30)
+    assert fake.data == {"app:k": b"v"} and fake.expiry == {"app:k": 30}
+    fake.data["other:k"] = b"x"
+    redis_cache.clear()
+    assert fake.data == {"other:k": b"x"}
+
+def test_list_key_normalizes_params(backend):
+    assert cache.list_key({"limit": 20, "search": None, "age": 30}) == cache.list_key({"age": 30, "limit": 20, "search": ""})
+    assert cache.list_key({"limit": 20}) != cache.list_key({"limit": 21})
+
+def test_get_is_served_from_cache_until_update(backend, statements):
+    submission_id = client.post("/api/submissions/", json=payload("cached@example.com")).json()["id"]
+    assert client.get(f"/api/submissions/{submission_id}").status_code == 200
+    statements.clear()
+    assert client.get(f"/api/submissions/{submission_id}").json()["email"] == "cached@example.com"
+    assert statements == []
+    client.put(f"/api/submissions/{submission_id}", json=payload("recached@example.com"))
+    assert client.get(f"/api/submissions/{submission_id}").json()["email"] == "recached@example.com"
+    client.delete(f"/api/submissions/{submission_id}")
+    assert client.get(f"/api/submissions/{submission_id}").status_code == 404
+
+def test_list_pages_invalidated_by_writes(backend, statements):
+    params = {"search": "listcache", "count": "none"}
+    assert client.get("/api/submissions/", params=params).json()["items"] == []
+    statements.clear()
+    assert client.get("/api/submissions/", params=params).json()["items"] == []
+    assert statements == []
+    submission_id = client.post("/api/submissions/", json=payload("listcache@example.com")).json()["id"]
+    assert [item["id"] for item in client.get("/api/submissions/", params=params).json()["items"]] == [submission_id]
+    client.delete(f"/api/submissions/{submission_id}")
+    assert client.get("/api/submissions/", params=params).json()["items"] == []
+
+def test_read_racing_a_write_cannot_store_stale_entry(backend):
+    key = cache.submission_key(12345)
+    cache.invalidate_submission(12345)
+    # A reader that looked up the key before the write commits stores into a retired key
+    cache.store(key, b"stale")
+    assert cache.submission_key(12345) != key
+    assert cache.lookup(cache.submission_key(12345)) is None
+
+def test_memory_cache_only_for_a_single_process(monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_BACKEND", "memory")
+    monkeypatch.delenv("AWS_LAMBDA_FUNCTION_NAME", raising=False)
+    cache.get_cache.cache_clear()
+    try:
+        assert isinstance(cache.get_cache(), cache.MemoryCache)
+        cache.get_cache.cache_clear()
+        monkeypatch.setenv("WEB_CONCURRENCY", "4")
+        assert isinstance(cache.get_cache(), cache.NullCache)
+    finally:
+        cache.get_cache.cache_clear()
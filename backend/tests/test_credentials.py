@@ -0,0 +1,121 @@
+import os
+from dotenv import load_dotenv
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../.env'))
+import sys
+import importlib
+import threading
+import types
+import pytest
+
+# The Lambda variant's modules live in the repository's top-level src/, which would clash
+# with backend's src package; load them under another name
+ROOT_SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../src'))
+
+def load_lambda_module(name):
+    if "lambda_src" not in sys.modules:
+        package = types.ModuleType("lambda_src")
+        package.__path__ = [ROOT_SRC]
+        sys.modules["lambda_src"] = package
+    return importlib.import_module(f"lambda_src.{name}")
+
+credentials = load_lambda_module("credentials")
+
+SECRET = {"username": "app", "password": "old", "host": "db", "port": "5432", "dbname": "formdb"}
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def make_secret(client, clock, **kwargs):
+    return credentials.CachedSecret("db-secret", client_factory=lambda: client, clock=clock, **kwargs)
+
+def wait_for_refresh():
+    for thread in threading.enumerate():
+        if thread.name == "secret-refresh":
+            thread.join(5)
+
+def test_value_is_cached_for_ttl():
+    client, clock = credentials.StaticSecretsClient({"db-secret": SECRET}), Clock()
+    secret = make_secret(client, clock, ttl=300, refresh_ahead=0)
+    assert secret.get()["password"] == "old"
+    client.put_secret_value(SecretId="db-secret", SecretString='{"password": "new"}')
+    clock.now += 299
+    assert secret.get()["password"] == "old" and client.calls == 1
+    clock.now += 1
+    assert secret.get()["password"] == "new" and client.calls == 2
+
+def test_refresh_ahead_serves_cached_value_and_refetches_in_background():
+    client, clock = credentials.StaticSecretsClient({"db-secret": SECRET}), Clock()
+    secret = make_secret(client, clock, ttl=300, refresh_ahead=60)
+    secret.get()
+    client.put_secret_value(SecretId="db-secret", SecretString='{"password": "new"}')
+    clock.now += 250
+    assert secret.get()["password"] == "old"
+    wait_for_refresh()
+    assert client.calls == 2 and not secret._refreshing
+    assert secret.get()["password"] == "new"
+
+def test_file_cache_is_shared_and_invalidated(tmp_path):
+    cache_file = str(tmp_path / "secret.json")
+    clock = Clock()
+    first_client = credentials.StaticSecretsClient({"db-secret": SECRET})
+    make_secret(first_client, clock, ttl=300, refresh_ahead=0, cache_file=cache_file).get()
+    assert os.stat(cache_file).st_mode & 0o777 == 0o600
+    # A cold start in the same container reads the file instead of Secrets Manager
+    second_client = credentials.StaticSecretsClient({"db-secret": SECRET})
+    second = make_secret(second_client, clock, ttl=300, refresh_ahead=0, cache_file=cache_file)
+    assert second.get()["password"] == "old" and second_client.calls == 0
+    second.invalidate()
+    assert not os.path.exists(cache_file)
+    second.get()
+    assert second_client.calls == 1
+    # An expired file, or one for another secret, is ignored
+    clock.now += 300
+    third_client = credentials.StaticSecretsClient({"other": SECRET, "db-secret": SECRET})
+    make_secret(third_client, clock, ttl=300, refresh_ahead=0, cache_file=cache_file).get()
+    credentials.CachedSecret("other", client_factory=lambda: third_client, clock=clock, ttl=300, refresh_ahead=0, cache_file=cache_file).get()
+    assert third_client.calls == 2
+
+class FakeOperationalError(Exception):
+    pass
+
+class FakeDialect:
+    loaded_dbapi = types.SimpleNamespace(OperationalError=FakeOperationalError)
+
+    def __init__(self, accepted_password, error="password authentication failed for user \"app\""):
+        self.accepted_password = accepted_password
+        self.error = error
+        self.attempts = []
+
+    def connect(self, *cargs, **cparams):
+        self.attempts.append(cparams["password"])
+        if cparams["password"] != self.accepted_password:
+            raise FakeOperationalError(self.error)
+        return "connection"
+
+@pytest.fixture
+def lambda_database(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("SECRETS_MANAGER_ARN", raising=False)
+    database = load_lambda_module("database")
+    client = credentials.StaticSecretsClient({"db-secret": SECRET})
+    monkeypatch.setattr(database, "db_secret", make_secret(client, Clock(), ttl=300, refresh_ahead=0))
+    return database, client
+
+def test_connect_retries_once_after_rotation(lambda_database):
+    database, client = lambda_database
+    database.db_secret.get()
+    client.put_secret_value(SecretId="db-secret", SecretString='{"username": "app", "password": "rotated", "host": "db", "port": "5432", "dbname": "formdb"}')
+    dialect = FakeDialect("rotated")
+    assert database.connect_with_current_secret(dialect, None, [], {}) == "connection"
+    assert dialect.attempts == ["old", "rotated"] and client.calls == 2
+
+def test_connect_does_not_retry_other_errors(lambda_database):
+    database, client = lambda_database
+    dialect = FakeDialect("never", error="could not connect to server")
+    with pytest.raises(FakeOperationalError):
+        database.connect_with_current_secret(dialect, None, [], {})
+    assert dialect.attempts == ["old"] and client.calls == 1
@@ -0,0 +1,113 @@
+import os
+from dotenv import load_dotenv
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../.env'))
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import asyncio
+from datetime import datetime, timedelta
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select, delete, update
+from src.main import app
+from src import crud, idempotency
+from src.database import SessionLocal, engine
+from src.models import Submission
+
+client = TestClient(app)
+
+@pytest.fixture
+def cleanup():
+    yield
+    with SessionLocal() as db:
+        db.execute(delete(idempotency.keys))
+        db.commit()
+        for submission_id in db.execute(select(Submission.id).where(Submission.email.like("%@idem.example.com"))).scalars().all():
+            crud.delete_submission(db, submission_id)
+
+def payload(email):
+    return {"full_name": "Retry User", "email": email, "phone_number": "+1234567890", "age": 37, "address": "6 Again Ln", "preferred_contact": "Email"}
+
+def test_retry_replays_first_response_without_insert(cleanup):
+    first = client.post("/api/submissions/", json=payload("retry@idem.example.com"), headers={"Idempotency-Key": "k-retry"})
+    assert first.status_code == 201
+    inserts = []
+    def record(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("INSERT INTO SUBMISSIONS"):
+            inserts.append(statement)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        retry = client.post("/api/submissions/", json=payload("retry@idem.example.com"), headers={"Idempotency-Key": "k-retry"})
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert retry.status_code == 201 and retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert inserts == []
+
+def test_key_reused_with_different_body_is_rejected(cleanup):
+    client.post("/api/submissions/", json=payload("one@idem.example.com"), headers={"Idempotency-Key": "k-reuse"})
+    assert client.post("/api/submissions/", json=payload("two@idem.example.com"), headers={"Idempotency-Key": "k-reuse"}).status_code == 422
+
+def test_client_errors_are_stored_too(cleanup):
+    client.post("/api/submissions/", json=payload("taken@idem.example.com"))
+    first = client.post("/api/submissions/", json=payload("taken@idem.example.com"), headers={"Idempotency-Key": "k-dup"})
+    retry = client.post("/api/submissions/", json=payload("taken@idem.example.com"), headers={"Idempotency-Key": "k-dup"})
+    assert first.status_code == retry.status_code == 400
+    assert retry.json() == first.json() and retry.headers["idempotent-replayed"] == "true"
+
+def test_bulk_retry_is_replayed(cleanup):
+    rows = [payload("bulk1@idem.example.com"), payload("bulk2@idem.example.com")]
+    first = client.post("/api/submissions/bulk", json=rows, headers={"Idempotency-Key": "k-bulk"})
+    retry = client.post("/api/submissions/bulk", json=rows, headers={"Idempotency-Key": "k-bulk"})
+    assert first.json()["created"] == 2
+    assert retry.json() == first.json()
+
+def test_concurrent_duplicates_run_once(cleanup):
+    async def post_twice():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            return await asyncio.gather(*(
+                async_client.post("/api/submissions/", json=payload("race@idem.example.com"), headers={"Idempotency-Key": "k-race"})
+                for _ in range(2)
+            ))
+    responses = asyncio.run(post_twice())
+    assert [response.status_code for response in responses] == [201, 201]
+    assert responses[0].json()["id"] == responses[1].json()["id"]
+    assert sorted(response.headers.get("idempotent-replayed", "false") for response in responses) == ["false", "true"]
+
+def test_abandoned_claim_is_taken_over_after_its_lease(cleanup, monkeypatch):
+    first = client.post("/api/submissions/", json=payload("lease@idem.example.com"), headers={"Idempotency-Key": "k-lease"})
+    with SessionLocal() as db:
+        assert db.execute(select(idempotency.keys.c.expires_at)).scalar_one() > datetime.utcnow() + timedelta(seconds=idempotency.IDEMPOTENCY_LEASE)
+        # As if the process had died mid-request: the row was never written and the claim never released
+        crud.delete_submission(db, first.json()["id"])
+        db.execute(update(idempotency.keys).values(status="in_progress", expires_at=datetime.utcnow() + timedelta(seconds=60)))
+        db.commit()
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_WAIT", 0.1)
+    assert client.post("/api/submissions/", json=payload("lease@idem.example.com"), headers={"Idempotency-Key": "k-lease"}).status_code == 409
+    with SessionLocal() as db:
+        db.execute(update(idempotency.keys).values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.commit()
+    retry = client.post("/api/submissions/", json=payload("lease@idem.example.com"), headers={"Idempotency-Key": "k-lease"})
+    assert retry.status_code == 201 and "idempotent-replayed" not in retry.headers
+
+def test_running_request_keeps_its_claim(cleanup, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_LEASE", 0.3)
+    renewals = []
+    original = idempotency.renew
+    monkeypatch.setattr(idempotency, "renew", lambda db, key, digest: renewals.append(key) or original(db, key, digest))
+    assert idempotency.with_session(idempotency.claim, "k-long", "a" * 64) is None
+    async def slow():
+        await asyncio.sleep(0.5)
+        return idempotency.Response(content=b"{}", status_code=201, media_type="application/json")
+    async def run():
+        return await idempotency.execute_once("k-long", "a" * 64, slow)
+    assert asyncio.run(run()).status_code == 201
+    assert renewals and idempotency.with_session(idempotency.load, "k-long")["status"] == "done"
+
+def test_complete_leaves_a_claim_taken_over_by_another_request(cleanup):
+    assert idempotency.with_session(idempotency.claim, "k-owner", "b" * 64) is None
+    idempotency.with_session(idempotency.complete, "k-owner", "c" * 64, 201, {}, b"{}")
+    idempotency.with_session(idempotency.release, "k-owner", "c" * 64)
+    state = idempotency.with_session(idempotency.load, "k-owner")
+    assert state["status"] == "in_progress" and state["request_hash"] == "b" * 64
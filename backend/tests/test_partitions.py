@@ -0,0 +1,54 @@
+import os
+from dotenv import load_dotenv
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../.env'))
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from datetime import date
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from src.main import app
+from src import crud, partitions
+from src.database import SessionLocal, engine
+
+client = TestClient(app)
+
+@pytest.fixture
+def email_registry(monkeypatch):
+    # SQLite stand-in for the PostgreSQL registry trigger: a duplicate INSERT is skipped, not raised
+    monkeypatch.setattr(crud, "SUBMISSIONS_PARTITIONED", True)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TRIGGER test_email_registry BEFORE INSERT ON submissions "
+            "WHEN EXISTS (SELECT 1 FROM submissions WHERE email = NEW.email) "
+            "BEGIN SELECT RAISE(IGNORE); END"
+        ))
+    yield
+    with engine.begin() as conn:
+        conn.execute(text("DROP TRIGGER test_email_registry"))
+
+def payload(email):
+    return {"full_name": "Partition User", "email": email, "phone_number": "+1234567890", "age": 33, "address": "3 Range Rd", "preferred_contact": "Email"}
+
+def test_partition_names_and_months():
+    assert partitions.parse_month("2024-03") == date(2024, 3, 1)
+    assert partitions.partition_name(date(2024, 3, 1)) == "submissions_y2024m03"
+
+def test_maintenance_is_a_noop_when_not_partitioned():
+    with SessionLocal() as db:
+        assert partitions.ensure_partitions(db) == []
+        assert partitions.detach_partition(db, date(2024, 1, 1)) is None
+
+def test_inserts_skip_duplicates_without_on_conflict(email_registry):
+    response = client.post("/api/submissions/", json=payload("partitioned@example.com"))
+    assert response.status_code == 201
+    assert client.post("/api/submissions/", json=payload("partitioned@example.com")).status_code == 400
+    with SessionLocal() as db:
+        inserted = crud.bulk_insert_submissions(db, [payload("partitioned@example.com"), payload("partitioned2@example.com")])
+    assert list(inserted) == ["partitioned2@example.com"]
+    client.delete(f"/api/submissions/{response.json()['id']}")
+    client.delete(f"/api/submissions/{inserted['partitioned2@example.com']}")
+
+def test_scheduled_event_ensures_partitions():
+    from src.main import handler
+    assert handler({"task": "partitions"}, None) == {"created": []}
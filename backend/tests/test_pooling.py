@@ -0,0 +1,64 @@
+import os
+from dotenv import load_dotenv
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../.env'))
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import NullPool
+from src.main import app
+from src.pooling import engine_options, engine_url, InstrumentedQueuePool, InstrumentedAsyncQueuePool, pool_metrics
+
+client = TestClient(app)
+
+def test_profiles():
+    lam = engine_options("postgresql+psycopg2://u:p@db/formdb", profile="lambda")
+    assert lam["poolclass"] is InstrumentedQueuePool
+    assert (lam["pool_size"], lam["max_overflow"], lam["pool_pre_ping"]) == (1, 1, True)
+    assert lam["connect_args"]["keepalives"] == 1
+
+    server = engine_options("postgresql+psycopg2://u:p@db/formdb", profile="server")
+    assert server["pool_size"] + server["max_overflow"] == 40
+
+    async_server = engine_options("postgresql+asyncpg://u:p@db/formdb", profile="server", use_async=True)
+    assert async_server["poolclass"] is InstrumentedAsyncQueuePool
+    assert "keepalives" not in async_server["connect_args"]
+
+    assert engine_options("sqlite://", profile="test")["poolclass"] is NullPool
+    assert engine_options("sqlite:////tmp/app.db", profile="test")["poolclass"] is NullPool
+    with pytest.raises(ValueError):
+        engine_options("sqlite://", profile="huge")
+
+def test_env_overrides_profile(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+    options = engine_options("postgresql+psycopg2://u:p@db/formdb", profile="server")
+    assert (options["pool_size"], options["max_overflow"]) == (3, 0)
+
+def test_checkout_wait_metrics(tmp_path):
+    options = engine_options(f"sqlite:///{tmp_path}/pool.db", profile="server")
+    options.update(pool_size=1, max_overflow=0, pool_timeout=0.05)
+    engine = create_engine(f"sqlite:///{tmp_path}/pool.db", **options)
+    held = engine.connect()
+    assert pool_metrics(engine)["saturation"] == 1.0
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    held.close()
+    metrics = pool_metrics(engine)
+    assert metrics["checkouts"] == 1
+    assert metrics["timeouts"] == 1
+    assert metrics["wait_seconds_max"] >= 0.05
+    assert metrics["peak_checked_out"] == 1
+    assert metrics["checked_out"] == 0
+
+def test_pool_metrics_endpoint():
+    resp = client.get("/api/metrics/pool")
+    assert resp.status_code == 200
+    assert resp.json()["sync"]["pool"]
+
+def test_memory_sqlite_gets_private_file():
+    url = engine_url("sqlite:///:memory:")
+    assert url.startswith("sqlite:///") and url.endswith("db.sqlite")
+    assert engine_url("sqlite:///:memory:") == url
+    assert engine_url("sqlite:////tmp/app.db") == "sqlite:////tmp/app.db"
@@ -0,0 +1,71 @@
+import os
+from dotenv import load_dotenv
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../.env'))
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from src.main import app
+from src import crud, replicas
+from src.database import Base, SessionLocal
+from src.models import Submission
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    replica = replicas.Replica(f"sqlite:///{tmp_path}/replica.db")
+    Base.metadata.create_all(bind=replica.engine)
+    monkeypatch.setattr(replicas, "replicas", [replica])
+    yield replica
+    # Through crud so the daily rollup is decremented too
+    with SessionLocal() as db:
+        for submission_id in db.scalars(select(Submission.id).where(Submission.email.like("%@replica.example.com"))).all():
+            crud.delete_submission(db, submission_id)
+
+def payload(email):
+    return {"full_name": "Replica User", "email": email, "phone_number": "+1234567890", "age": 30, "address": "1 Main St", "preferred_contact": "Email"}
+
+def test_reads_go_to_replica(replica):
+    with replica.SessionLocal() as db:
+        db.add(Submission(**payload("only@replica.example.com")))
+        db.commit()
+    resp = TestClient(app).get("/api/submissions/", params={"search": "replica.example.com"})
+    assert [item["email"] for item in resp.json()["items"]] == ["only@replica.example.com"]
+
+def test_read_your_writes(replica):
+    writer = TestClient(app)
+    resp = writer.post("/api/submissions/", json=payload("writer@replica.example.com"))
+    assert resp.status_code == 201
+    assert replicas.READ_YOUR_WRITES_COOKIE in resp.cookies
+    submission_id = resp.json()["id"]
+    # Anyone else reads the (stale) replica; the writer sees its row on the primary
+    assert TestClient(app).get(f"/api/submissions/{submission_id}").status_code == 404
+    assert writer.get(f"/api/submissions/{submission_id}").status_code == 200
+
+def test_replica_reads_do_not_fill_cache(replica, monkeypatch):
+    submission_id = TestClient(app).post("/api/submissions/", json=payload("cached@replica.example.com")).json()["id"]
+    # The replica still has the row as it was before a later write on the primary
+    with replica.SessionLocal() as db:
+        db.add(Submission(id=submission_id, **{**payload("cached@replica.example.com"), "full_name": "Stale Name"}))
+        db.commit()
+    assert TestClient(app).get(f"/api/submissions/{submission_id}").json()["full_name"] == "Stale Name"
+    monkeypatch.setattr(replicas, "replicas", [])
+    assert TestClient(app).get(f"/api/submissions/{submission_id}").json()["full_name"] == "Replica User"
+
+def test_failed_write_does_not_pin_primary(replica):
+    resp = TestClient(app).put("/api/submissions/999999", json=payload("nobody@replica.example.com"))
+    assert resp.status_code == 404
+    assert replicas.READ_YOUR_WRITES_COOKIE not in resp.cookies
+
+def test_lagging_replica_falls_back_to_primary(replica, monkeypatch):
+    submission_id = TestClient(app).post("/api/submissions/", json=payload("lag@replica.example.com")).json()["id"]
+    monkeypatch.setattr(replicas, "replication_lag", lambda conn: replicas.REPLICA_MAX_LAG + 60)
+    replica.checked_at = None
+    assert TestClient(app).get(f"/api/submissions/{submission_id}").status_code == 200
+    assert replica.healthy and not replica.usable()
+
+def test_unreachable_replica_falls_back_to_primary(tmp_path, monkeypatch):
+    monkeypatch.setattr(replicas, "replicas", [replicas.Replica(f"sqlite:///{tmp_path}/missing/replica.db")])
+    resp = TestClient(app).get("/api/submissions/", params={"count": "none"})
+    assert resp.status_code == 200
+    assert replicas.status()[0]["healthy"] is False
@@ -0,0 +1,110 @@
+import os
+from dotenv import load_dotenv
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../.env'))
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import asyncio
+import threading
+import time
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from src.main import app
+from src import crud, cache, replicas, singleflight
+
+def test_threads_share_one_execution():
+    flight = singleflight.SingleFlight(enabled=True)
+    calls, results = [], []
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return "page"
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1 and results == ["page"] * 5
+    assert flight.stats == {"executed": 1, "shared": 4}
+
+def test_coroutines_share_one_execution_and_errors():
+    flight = singleflight.SingleFlight(enabled=True)
+    calls = []
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "page"
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+    async def run():
+        pages = await asyncio.gather(*(flight.ado("k", slow) for _ in range(5)))
+        errors = await asyncio.gather(*(flight.ado("e", failing) for _ in range(3)), return_exceptions=True)
+        return pages, errors
+    pages, errors = asyncio.run(run())
+    assert len(calls) == 1 and pages == ["page"] * 5
+    assert all(isinstance(error, ValueError) for error in errors)
+
+def test_grace_reuses_result_until_it_expires_or_a_write():
+    now = [0.0]
+    flight = singleflight.SingleFlight(grace_ms=200, enabled=True, clock=lambda: now[0])
+    calls = []
+    def run():
+        calls.append(1)
+        return len(calls)
+    assert flight.do("k", run) == 1
+    assert flight.do("k", run) == 1
+    now[0] = 0.3
+    assert flight.do("k", run) == 2
+    flight.expire()
+    assert flight.do("k", run) == 3
+
+def test_write_starts_a_new_generation():
+    flight = singleflight.SingleFlight(enabled=True)
+    gate, results = threading.Event(), []
+    def before():
+        gate.wait(5)
+        return "before"
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", before))) for _ in range(2)]
+    threads[0].start()
+    while not flight._calls:
+        time.sleep(0.01)
+    threads[1].start()
+    while flight.stats["shared"] < 1:
+        time.sleep(0.01)
+    # Arriving after a write, it runs its own read instead of joining the one in flight
+    flight.expire()
+    assert flight.do("k", lambda: "after") == "after"
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["before", "before"]
+    assert flight.stats == {"executed": 2, "shared": 1}
+
+def test_analytics_read_your_writes_runs_alone(monkeypatch):
+    monkeypatch.setattr(singleflight, "reads", singleflight.SingleFlight(enabled=True))
+    client = TestClient(app)
+    client.cookies.set(replicas.READ_YOUR_WRITES_COOKIE, f"{time.time() + 60:.3f}")
+    assert client.get("/api/submissions/api/analytics").status_code == 200
+    assert singleflight.reads.stats["executed"] == 0
+    assert TestClient(app).get("/api/submissions/api/analytics").status_code == 200
+    assert singleflight.reads.stats["executed"] == 1
+
+def test_identical_list_requests_query_once(monkeypatch):
+    monkeypatch.setattr(singleflight, "reads", singleflight.SingleFlight(enabled=True))
+    cache.clear()
+    calls = []
+    original = crud.get_submissions_json
+    def counting(*args, **kwargs):
+        calls.append(1)
+        time.sleep(0.1)
+        return original(*args, **kwargs)
+    monkeypatch.setattr(crud, "get_submissions_json", counting)
+    async def fetch_all():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.get("/api/submissions/", params={"sort_by": "created_at", "search": "flight"}) for _ in range(5)))
+    responses = asyncio.run(fetch_all())
+    assert [response.status_code for response in responses] == [200] * 5
+    assert len({response.content for response in responses}) == 1
+    assert len(calls) == 1
@@ -3,6 +3,10 @@ from dotenv import load_dotenv
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../.env'))
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import csv
+import gzip
+import io
+import json
 import pytest
 from fastapi.testclient import TestClient
 from src.main import app
@@ -133,3 +137,335 @@ def test_validation_errors():
     resp = client.post("/api/submissions/", json=data)
     assert resp.status_code == 422
     # print('Ballllllllll',resp.json())
+
+def test_list_submissions_cursor_pagination():
+    created = []
+    for i in range(5):
+        payload = make_submission_payload(f"cursor{i}@example.com")
+        payload["full_name"] = "Cursor Walker"
+        payload["age"] = 40 + i % 2
+        created.append(client.post("/api/submissions/", json=payload).json()["id"])
+    for sort in ["", "&sort_by=created_at", "&sort_by=full_name&sort_order=asc", "&sort_by=age", "&sort_by=age&sort_order=asc"]:
+        seen = []
+        resp = client.get(f"/api/submissions/?search=Cursor&limit=2{sort}")
+        while True:
+            assert resp.status_code == 200
+            data = resp.json()
+            seen.extend(item["id"] for item in data["items"])
+            if not data["next_cursor"]:
+                break
+            resp = client.get(f"/api/submissions/?search=Cursor&limit=2{sort}&cursor={data['next_cursor']}")
+        assert sorted(seen) == sorted(created)
+    # A cursor issued for one sort cannot be replayed against another
+    cursor = client.get("/api/submissions/?search=Cursor&limit=2&sort_by=age").json()["next_cursor"]
+    resp = client.get(f"/api/submissions/?search=Cursor&limit=2&sort_by=full_name&cursor={cursor}")
+    assert resp.status_code == 400
+
+def test_list_submissions_count_modes():
+    for i in range(3):
+        client.post("/api/submissions/", json=make_submission_payload(f"count{i}@example.com"))
+    exact = client.get("/api/submissions/?search=count").json()
+    assert exact["total_kind"] == "exact" and exact["total"] == 3
+    data = client.get("/api/submissions/?search=count&count=none").json()
+    assert data["total"] is None and data["total_kind"] == "none"
+    data = client.get("/api/submissions/?search=count&count=capped&count_cap=2").json()
+    assert data["total"] == 2 and data["total_kind"] == "capped"
+    data = client.get("/api/submissions/?search=count&count=capped&count_cap=5").json()
+    assert data["total"] == 3 and data["total_kind"] == "exact"
+    # Planner estimates need PostgreSQL; other databases fall back to an exact count
+    data = client.get("/api/submissions/?search=count&count=estimate").json()
+    assert data["total_kind"] in ("exact", "estimate")
+    # Cached exact counts are invalidated by writes
+    client.post("/api/submissions/", json=make_submission_payload("count3@example.com"))
+    assert client.get("/api/submissions/?search=count").json()["total"] == 4
+    assert client.get("/api/submissions/?count=bogus").status_code == 400
+
+def test_search_relevance_ordering():
+    for name, email in [("Relevance Zed", "zed.other@example.com"), ("Relevance Zed Zedson", "zedzed@example.com"), ("Unrelated Person", "relevance.zed@example.com")]:
+        payload = make_submission_payload(email)
+        payload["full_name"] = name
+        assert client.post("/api/submissions/", json=payload).status_code == 201
+    data = client.get("/api/submissions/?search=Zed&sort_by=relevance").json()
+    assert len(data["items"]) == 3
+    # Substring matches in either name or email are found
+    data = client.get("/api/submissions/?search=elevance Ze").json()
+    assert {item["email"] for item in data["items"]} >= {"zed.other@example.com", "zedzed@example.com"}
+    # Relevance ordering pages with a cursor like any other sort
+    seen = []
+    resp = client.get("/api/submissions/?search=Zed&sort_by=relevance&limit=1").json()
+    while True:
+        seen.extend(item["id"] for item in resp["items"])
+        if not resp["next_cursor"]:
+            break
+        resp = client.get(f"/api/submissions/?search=Zed&sort_by=relevance&limit=1&cursor={resp['next_cursor']}").json()
+    assert len(set(seen)) == 3
+    # Terms too short for the trigram index still match
+    assert client.get("/api/submissions/?search=Ze").json()["total"] >= 3
+
+def test_writes_use_one_statement_each():
+    from sqlalchemy import event
+    from src.database import engine as app_engine
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement.split()[0].upper())
+    event.listen(app_engine, "before_cursor_execute", record)
+    try:
+        resp = client.post("/api/submissions/", json=make_submission_payload("roundtrip@example.com"))
+        submission_id = resp.json()["id"]
+        # The second INSERT is the submission_daily_stats upsert in the same transaction
+        assert statements == ["INSERT", "INSERT"]
+        statements.clear()
+        assert client.post("/api/submissions/", json=make_submission_payload("roundtrip@example.com")).status_code == 400
+        assert statements == ["INSERT"]
+        statements.clear()
+        resp = client.put(f"/api/submissions/{submission_id}", json=make_submission_payload("roundtrip2@example.com"))
+        assert resp.status_code == 200 and resp.json()["email"] == "roundtrip2@example.com"
+        assert statements == ["UPDATE"]
+        statements.clear()
+        assert client.delete(f"/api/submissions/{submission_id}").status_code == 204
+        assert statements == ["DELETE", "INSERT"]
+    finally:
+        event.remove(app_engine, "before_cursor_execute", record)
+
+def test_update_duplicate_email_and_missing():
+    client.post("/api/submissions/", json=make_submission_payload("taken@example.com"))
+    submission_id = client.post("/api/submissions/", json=make_submission_payload("mover@example.com")).json()["id"]
+    resp = client.put(f"/api/submissions/{submission_id}", json=make_submission_payload("taken@example.com"))
+    assert resp.status_code == 400
+    assert "Duplicate email" in str(resp.json())
+    assert client.put("/api/submissions/999999", json=make_submission_payload("nobody@example.com")).status_code == 404
+    assert client.delete("/api/submissions/999999").status_code == 404
+
+def test_bulk_create_json_array():
+    client.post("/api/submissions/", json=make_submission_payload("bulk-existing@example.com"))
+    rows = [make_submission_payload(f"bulk{i}@example.com") for i in range(3)]
+    rows.append(make_submission_payload("bulk-existing@example.com"))
+    rows.append(make_submission_payload("bulk0@example.com"))
+    rows.append({**make_submission_payload("bulk-bad@example.com"), "age": 5})
+    resp = client.post("/api/submissions/bulk", json=rows)
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert (data["created"], data["duplicate"], data["invalid"]) == (3, 2, 1)
+    assert [item["status"] for item in data["items"]] == ["created"] * 3 + ["duplicate", "duplicate", "invalid"]
+    first_id = data["items"][0]["id"]
+    assert client.get(f"/api/submissions/{first_id}").json()["email"] == "bulk0@example.com"
+    assert data["rows_per_second"] > 0
+
+def test_bulk_create_ndjson(monkeypatch):
+    from src import crud
+    monkeypatch.setattr(crud, "BULK_BATCH_SIZE", 2)
+    lines = [json.dumps(make_submission_payload(f"ndjson{i}@example.com")) for i in range(4)]
+    lines.insert(2, "{not json")
+    resp = client.post("/api/submissions/bulk", content="\n".join(lines) + "\n", headers={"Content-Type": "application/x-ndjson"})
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert (data["created"], data["invalid"]) == (4, 1)
+    assert data["items"][2]["status"] == "invalid"
+    assert client.post("/api/submissions/bulk", json={"not": "a list"}).status_code == 400
+
+def test_export_streams_filtered_rows(monkeypatch):
+    from src import export
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+    for i in range(3):
+        payload = make_submission_payload(f"export{i}@example.com")
+        payload["full_name"] = "Export Person"
+        client.post("/api/submissions/", json=payload)
+    resp = client.get("/api/submissions/export?format=csv&search=Export Person&sort_by=created_at&sort_order=asc")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(resp.text)))
+    assert [row["email"] for row in rows] == [f"export{i}@example.com" for i in range(3)]
+    resp = client.get("/api/submissions/export?format=ndjson&search=Export Person&gzip=true")
+    assert resp.headers["content-type"] == "application/gzip"
+    lines = gzip.decompress(resp.content).decode().splitlines()
+    assert {json.loads(line)["email"] for line in lines} == {f"export{i}@example.com" for i in range(3)}
+    assert client.get("/api/submissions/export?format=xml").status_code == 400
+
+def test_analytics_reads_daily_rollup():
+    from datetime import datetime
+    from sqlalchemy import update
+    from src import crud
+    from src.database import SessionLocal
+    from src.models import SubmissionDailyStats
+    from src.rollups import reconcile_daily_stats
+    # Everything is measured against the days this test writes to, relative to a baseline
+    first = client.post("/api/submissions/", json=make_submission_payload("rollup0@example.com")).json()
+    today = first["created_at"][:10]
+    def total_today():
+        return client.get(f"/api/submissions/api/analytics?start={today}&end={today}").json()["total"]
+    before = total_today()
+    ids = [client.post("/api/submissions/", json=make_submission_payload(f"rollup{i}@example.com")).json()["id"] for i in (1, 2)]
+    client.post("/api/submissions/bulk", json=[make_submission_payload("rollup-bulk@example.com")])
+    assert total_today() == before + 3
+    client.delete(f"/api/submissions/{first['id']}")
+    ranged = client.get(f"/api/submissions/api/analytics?start={today}&end={today}").json()
+    assert ranged["total"] == before + 2 and [day for day, _ in ranged["by_day"]] == [today]
+    assert client.get("/api/submissions/api/analytics?end=2000-01-01").json() == {"total": 0, "by_day": []}
+    # Reconcile repairs drift in the rollup, on a day only this test uses
+    owned = datetime(2001, 2, 3, 12, 0)
+    rows = [{**make_submission_payload(f"rollup-old{i}@example.com"), "created_at": owned, "updated_at": owned} for i in range(2)]
+    with SessionLocal() as db:
+        old_ids = list(crud.bulk_insert_submissions(db, rows).values())
+        db.execute(update(SubmissionDailyStats).where(SubmissionDailyStats.day == owned.date()).values(submission_count=999))
+        db.commit()
+        drift = reconcile_daily_stats(db, owned.date(), owned.date())
+    # One bulk batch bumps a single bucket
+    assert drift == {owned.date(): (999, 2)}
+    assert client.get("/api/submissions/api/analytics?start=2001-02-03&end=2001-02-03").json() == {"total": 2, "by_day": [["2001-02-03", 2]]}
+    with SessionLocal() as db:
+        for submission_id in old_ids:
+            crud.delete_submission(db, submission_id)
+
+def test_conditional_get_submission(monkeypatch):
+    from sqlalchemy import event
+    from src import cache
+    from src.database import engine as app_engine
+    memory = cache.MemoryCache()
+    monkeypatch.setattr(cache, "get_cache", lambda: memory)
+    submission_id = client.post("/api/submissions/", json=make_submission_payload("etag@example.com")).json()["id"]
+    resp = client.get(f"/api/submissions/{submission_id}")
+    etag = resp.headers["etag"]
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(app_engine, "before_cursor_execute", record)
+    try:
+        # Cache hit: answered from the stored validator without SQL
+        resp = client.get(f"/api/submissions/{submission_id}", headers={"If-None-Match": etag})
+        assert resp.status_code == 304 and resp.content == b"" and resp.headers["etag"] == etag
+        assert statements == []
+        # Cache miss: one probe of updated_at, no row load
+        monkeypatch.setattr(cache, "get_cache", lambda: cache.NullCache())
+        resp = client.get(f"/api/submissions/{submission_id}", headers={"If-None-Match": f'"stale", W/{etag}'})
+        assert resp.status_code == 304
+        assert len(statements) == 1 and "full_name" not in statements[0]
+    finally:
+        event.remove(app_engine, "before_cursor_execute", record)
+    resp = client.get(f"/api/submissions/{submission_id}", headers={"If-None-Match": '"stale"'})
+    assert resp.status_code == 200 and resp.headers["etag"] == etag
+    client.delete(f"/api/submissions/{submission_id}")
+    assert client.get(f"/api/submissions/{submission_id}", headers={"If-None-Match": etag}).status_code == 404
+
+def test_conditional_list_submissions():
+    params = {"search": "etaglist", "count": "exact"}
+    resp = client.get("/api/submissions/", params=params)
+    etag = resp.headers["etag"]
+    assert client.get("/api/submissions/", params=params, headers={"If-None-Match": etag}).status_code == 304
+    # Other parameters name a different page, so a different validator
+    assert client.get("/api/submissions/", params={**params, "limit": 5}).headers["etag"] != etag
+    submission_id = client.post("/api/submissions/", json=make_submission_payload("etaglist@example.com")).json()["id"]
+    resp = client.get("/api/submissions/", params=params, headers={"If-None-Match": etag})
+    assert resp.status_code == 200 and resp.json()["total"] == 1
+    etag = resp.headers["etag"]
+    client.delete(f"/api/submissions/{submission_id}")
+    assert client.get("/api/submissions/", params=params, headers={"If-None-Match": etag}).status_code == 200
+
+def test_list_miss_runs_only_the_page_query(monkeypatch):
+    from sqlalchemy import event
+    from src import cache
+    from src.database import engine as app_engine
+    monkeypatch.setattr(cache, "get_cache", lambda: cache.NullCache())
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(app_engine, "before_cursor_execute", record)
+    try:
+        resp = client.get("/api/submissions/", params={"count": "none", "limit": 5})
+    finally:
+        event.remove(app_engine, "before_cursor_execute", record)
+    assert resp.status_code == 200 and resp.headers["etag"]
+    # No aggregate over the whole table, only the limited page
+    assert len(statements) == 1 and "count(" not in statements[0].lower() and "sum(" not in statements[0].lower()
+
+def test_update_with_if_match(monkeypatch):
+    from sqlalchemy import event
+    from src import routes
+    from src.database import engine as app_engine
+    submission_id = client.post("/api/submissions/", json=make_submission_payload("ifmatch@example.com")).json()["id"]
+    etag = client.get(f"/api/submissions/{submission_id}").headers["etag"]
+    assert etag == f'"{submission_id}-1"'
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement.split()[0].upper())
+    event.listen(app_engine, "before_cursor_execute", record)
+    try:
+        resp = client.put(f"/api/submissions/{submission_id}", json=make_submission_payload("ifmatch2@example.com"), headers={"If-Match": etag})
+        assert statements == ["UPDATE"]
+    finally:
+        event.remove(app_engine, "before_cursor_execute", record)
+    assert resp.status_code == 200 and resp.json()["version"] == 2
+    assert resp.headers["etag"] == f'"{submission_id}-2"'
+    # A second editor still holding version 1 is refused instead of clobbering the first
+    resp = client.put(f"/api/submissions/{submission_id}", json=make_submission_payload("ifmatch3@example.com"), headers={"If-Match": etag})
+    assert resp.status_code == 412
+    assert client.get(f"/api/submissions/{submission_id}").json()["email"] == "ifmatch2@example.com"
+    assert client.put(f"/api/submissions/{submission_id}", json=make_submission_payload("ifmatch3@example.com"), headers={"If-Match": "*"}).status_code == 200
+    assert client.put("/api/submissions/999999", json=make_submission_payload("ifmatch4@example.com"), headers={"If-Match": etag}).status_code == 412
+    monkeypatch.setattr(routes, "REQUIRE_IF_MATCH", True)
+    assert client.put(f"/api/submissions/{submission_id}", json=make_submission_payload("ifmatch5@example.com")).status_code == 428
+    client.delete(f"/api/submissions/{submission_id}")
+
+def test_patch_updates_only_sent_columns(monkeypatch):
+    from sqlalchemy import event
+    from src import schemas
+    from src.database import engine as app_engine
+    created = client.post("/api/submissions/", json=make_submission_payload("patch@example.com")).json()
+    other = client.post("/api/submissions/", json=make_submission_payload("patch-other@example.com")).json()
+    sanitized = []
+    real_clean_html = schemas.clean_html
+    monkeypatch.setattr(schemas, "clean_html", lambda v: sanitized.append(v) or real_clean_html(v))
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(app_engine, "before_cursor_execute", record)
+    try:
+        resp = client.patch(f"/api/submissions/{created['id']}", json={"phone_number": "+1987654321"}, headers={"If-Match": f'"{created["id"]}-1"'})
+    finally:
+        event.remove(app_engine, "before_cursor_execute", record)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["phone_number"] == "+1987654321" and body["full_name"] == created["full_name"] and body["version"] == 2
+    assert resp.headers["etag"] == f'"{created["id"]}-2"'
+    assert sanitized == ["+1987654321"]
+    assert len(statements) == 1
+    set_clause = statements[0].split("WHERE")[0]
+    assert "phone_number" in set_clause and "full_name" not in set_clause and "email" not in set_clause
+    # Stale version, duplicate email, empty body and out-of-range values are all refused
+    assert client.patch(f"/api/submissions/{created['id']}", json={"age": 40}, headers={"If-Match": f'"{created["id"]}-1"'}).status_code == 412
+    assert client.patch(f"/api/submissions/{created['id']}", json={"email": other["email"]}).status_code == 400
+    assert client.patch(f"/api/submissions/{created['id']}", json={}).status_code == 400
+    assert client.patch(f"/api/submissions/{created['id']}", json={"age": 5}).status_code == 422
+    assert client.patch("/api/submissions/999999", json={"age": 40}).status_code == 404
+    resp = client.patch(f"/api/submissions/{created['id']}", json={"address": None})
+    assert resp.status_code == 200 and resp.json()["address"] is None
+    client.delete(f"/api/submissions/{created['id']}")
+    client.delete(f"/api/submissions/{other['id']}")
+
+def test_fields_projection_narrows_select_and_body():
+    from sqlalchemy import event
+    from src.database import engine as app_engine
+    created = client.post("/api/submissions/", json=make_submission_payload("projection@example.com")).json()
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(app_engine, "before_cursor_execute", record)
+    try:
+        resp = client.get("/api/submissions/", params={"search": "projection@example.com", "fields": "full_name,email,created_at", "sort_by": "age", "limit": 1})
+        page_select = statements[-1]
+        statements.clear()
+        detail = client.get(f"/api/submissions/{created['id']}", params={"fields": "email"})
+        detail_select = statements[-1]
+    finally:
+        event.remove(app_engine, "before_cursor_execute", record)
+    assert resp.status_code == 200
+    assert resp.json()["items"] == [{"id": created["id"], "full_name": created["full_name"], "email": created["email"], "created_at": created["created_at"]}]
+    # The wide address column is never selected, even though the sort key (age) is
+    projected = page_select.split("FROM")[0]
+    assert "address" not in projected and "age" in projected
+    assert detail.json() == {"id": created["id"], "email": created["email"]}
+    assert "address" not in detail_select.split("FROM")[0]
+    # Each projection is its own representation
+    assert detail.headers["etag"] != client.get(f"/api/submissions/{created['id']}").headers["etag"]
+    assert client.get(f"/api/submissions/{created['id']}", params={"fields": "email"}, headers={"If-None-Match": detail.headers["etag"]}).status_code == 304
+    assert client.get("/api/submissions/", params={"fields": "password"}).status_code == 400
+    client.delete(f"/api/submissions/{created['id']}")
@@ -0,0 +1,83 @@
+import os
+from dotenv import load_dotenv
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../.env'))
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, delete
+from src.main import app, handler
+from src import crud, writequeue
+from src.database import SessionLocal
+from src.models import Submission
+
+def payload(email):
+    return {"full_name": "Queued User", "email": email, "phone_number": "+1234567890", "age": 29, "address": "5 Batch Ave", "preferred_contact": "Both"}
+
+@pytest.fixture
+def cleanup():
+    yield
+    with SessionLocal() as db:
+        for submission_id in db.execute(select(Submission.id).where(Submission.email.like("%@queue.example.com"))).scalars().all():
+            crud.delete_submission(db, submission_id)
+
+def test_queue_mode_accepts_with_202_and_group_commits(monkeypatch, cleanup):
+    monkeypatch.setattr(writequeue, "WRITE_MODE", "queue")
+    with TestClient(app) as client:
+        responses = [client.post("/api/submissions/", json=payload(email)) for email in ("q1@queue.example.com", "q2@queue.example.com", "q1@queue.example.com")]
+        assert [response.status_code for response in responses] == [202, 202, 202]
+        assert responses[0].headers["location"] == f"/api/submissions/receipts/{responses[0].json()['receipt']}"
+    # Leaving the client runs shutdown, which flushes everything still queued
+    client = TestClient(app)
+    results = [client.get(response.headers["location"]).json() for response in responses]
+    assert [result["status"] for result in results] == ["created", "created", "duplicate"]
+    assert results[2]["detail"] == "Duplicate email"
+    with SessionLocal() as db:
+        assert db.get(Submission, results[0]["submission_id"]).email == "q1@queue.example.com"
+
+def test_failing_batch_is_retried_then_marked_failed(monkeypatch, cleanup):
+    attempts = []
+    def unavailable(items):
+        attempts.append(len(items))
+        raise RuntimeError("database unavailable")
+    monkeypatch.setattr(writequeue, "commit_items", unavailable)
+    queue = writequeue.WriteQueue(max_attempts=3, retry_delay=0)
+    monkeypatch.setattr(writequeue, "write_queue", queue)
+    items = [(writequeue.new_receipt(), payload(f"f{i}@queue.example.com")) for i in range(2)]
+    asyncio.run(queue.flush(items))
+    assert attempts == [2, 2, 2] and not queue.pending and not queue.failed
+    with SessionLocal() as db:
+        assert [writequeue.get_receipt(db, receipt)["status"] for receipt, _ in items] == ["failed", "failed"]
+        db.execute(delete(writequeue.receipts).where(writequeue.receipts.c.id.in_([receipt for receipt, _ in items])))
+        db.commit()
+
+def test_unknown_receipt_is_404():
+    with TestClient(app) as client:
+        assert client.get("/api/submissions/receipts/000000000000deadbeef").status_code == 404
+        assert client.get("/api/submissions/receipts/not-a-receipt").status_code == 404
+        # A fresh receipt may still be in SQS or on another worker
+        assert client.get(f"/api/submissions/receipts/{writequeue.new_receipt()}").json()["status"] == "queued"
+
+def test_sqs_batch_is_committed_once(cleanup):
+    records = [
+        {"messageId": f"m{i}", "eventSource": "aws:sqs", "body": json.dumps({"receipt": writequeue.new_receipt(), "values": payload(f"s{i}@queue.example.com")})}
+        for i in range(3)
+    ]
+    assert handler({"Records": records}, None) == {"batchItemFailures": []}
+    # A redelivered batch is skipped by receipt, not reported as duplicate emails
+    assert handler({"Records": records}, None) == {"batchItemFailures": []}
+    with SessionLocal() as db:
+        statuses = [writequeue.get_receipt(db, json.loads(record["body"])["receipt"])["status"] for record in records]
+    assert statuses == ["created"] * 3
+
+def test_sqs_reports_only_failed_records(cleanup, monkeypatch):
+    good = [{"messageId": f"g{i}", "eventSource": "aws:sqs", "body": json.dumps({"receipt": writequeue.new_receipt(), "values": payload(f"g{i}@queue.example.com")})} for i in range(2)]
+    poison = {"messageId": "bad-values", "eventSource": "aws:sqs", "body": json.dumps({"receipt": writequeue.new_receipt(), "values": {**payload("bad@queue.example.com"), "age": None}})}
+    unreadable = {"messageId": "bad-json", "eventSource": "aws:sqs", "body": "{not json"}
+    result = handler({"Records": [good[0], poison, unreadable, good[1]]}, None)
+    assert sorted(failure["itemIdentifier"] for failure in result["batchItemFailures"]) == ["bad-json", "bad-values"]
+    with SessionLocal() as db:
+        statuses = [writequeue.get_receipt(db, json.loads(record["body"])["receipt"])["status"] for record in good]
+    assert statuses == ["created", "created"]
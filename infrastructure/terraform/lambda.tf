@@ -36,7 +36,8 @@ resource "aws_lambda_function" "backend" {
   timeout       = 30
   environment {
     variables = {
-      DATABASE = var.db_url
+      DATABASE       = var.db_url
+      ARCHIVE_BUCKET = var.s3_bucket_name
     }
   }
   depends_on = [null_resource.build_lambda]
@@ -169,4 +170,44 @@ resource "aws_iam_role_policy_attachment" "lambda_secrets_access" {
 #   name = "form-db-credentials"
 # }
 # And reference:
-# Resource = data.aws_secretsmanager_secret.db_credentials.arn 
\ No newline at end of file
+# Resource = data.aws_secretsmanager_secret.db_credentials.arn 
+# Nightly archival of old submissions (src/archive.py), on the same function as the API
+resource "aws_cloudwatch_event_rule" "archive" {
+  name                = "form-backend-archive"
+  schedule_expression = "cron(0 3 * * ? *)"
+}
+
+resource "aws_cloudwatch_event_target" "archive" {
+  rule  = aws_cloudwatch_event_rule.archive.name
+  arn   = aws_lambda_function.backend.arn
+  input = jsonencode({ task = "archive" })
+}
+
+resource "aws_lambda_permission" "archive_schedule" {
+  statement_id  = "AllowArchiveSchedule"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.backend.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.archive.arn
+}
+
+# Daily creation of the coming months' partitions (src/partitions.py); a no-op unless
+# SUBMISSIONS_PARTITIONED is set on PostgreSQL
+resource "aws_cloudwatch_event_rule" "partitions" {
+  name                = "form-backend-partitions"
+  schedule_expression = "cron(0 2 * * ? *)"
+}
+
+resource "aws_cloudwatch_event_target" "partitions" {
+  rule  = aws_cloudwatch_event_rule.partitions.name
+  arn   = aws_lambda_function.backend.arn
+  input = jsonencode({ task = "partitions" })
+}
+
+resource "aws_lambda_permission" "partitions_schedule" {
+  statement_id  = "AllowPartitionsSchedule"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.backend.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.partitions.arn
+}
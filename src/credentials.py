@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+
+SECRET_CACHE_TTL = float(os.getenv("SECRET_CACHE_TTL", "300"))
+# Start a background re-read this many seconds before the cached value expires
+SECRET_REFRESH_AHEAD = float(os.getenv("SECRET_REFRESH_AHEAD", "60"))
+# Optional on-disk copy shared by cold starts of the same container, e.g. /tmp/db-secret.json
+SECRET_CACHE_FILE = os.getenv("SECRET_CACHE_FILE")
+
+
+# Stand-in for the boto3 Secrets Manager client, for tests and local runs
+class StaticSecretsClient:
+    def __init__(self, secrets=None):
+        self.secrets = dict(secrets or {})
+        self.calls = 0
+
+    def put_secret_value(self, SecretId, SecretString):
+        self.secrets[SecretId] = json.loads(SecretString)
+
+    def get_secret_value(self, SecretId):
+        self.calls += 1
+        return {"SecretString": json.dumps(self.secrets[SecretId])}
+
+
+def secretsmanager_client():
+    import boto3
+    return boto3.client("secretsmanager", region_name=os.getenv("AWS_REGION", "us-east-2"))
+
+
+# A JSON secret cached in memory (and optionally in a file) for `ttl` seconds. Reads
+# inside the refresh-ahead window return the cached value and re-fetch it on a
+# background thread, so rotation is picked up without blocking a request.
+# invalidate() forces the next read back to Secrets Manager, e.g. after an auth failure.
+class CachedSecret:
+    def __init__(self, secret_id, client_factory=secretsmanager_client, ttl=SECRET_CACHE_TTL,
+                 refresh_ahead=SECRET_REFRESH_AHEAD, cache_file=SECRET_CACHE_FILE, clock=time.time):
+        self.secret_id = secret_id
+        self.client_factory = client_factory
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl)
+        self.cache_file = cache_file
+        self.clock = clock
+        self._client = None
+        self._value = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self):
+        now = self.clock()
+        value, fetched_at = self._value, self._fetched_at
+        if value is None or now - fetched_at >= self.ttl:
+            with self._lock:
+                if self._value is None or self.clock() - self._fetched_at >= self.ttl:
+                    if not self._load_file():
+                        self._fetch()
+                return self._value
+        if now - fetched_at >= self.ttl - self.refresh_ahead:
+            self._refresh_in_background()
+        # The value read above: a background refresh may replace self._value at any moment
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+            self._fetched_at = 0.0
+            if self.cache_file:
+                try:
+                    os.remove(self.cache_file)
+                except FileNotFoundError:
+                    pass
+
+    def _fetch(self):
+        if self._client is None:
+            self._client = self.client_factory()
+        response = self._client.get_secret_value(SecretId=self.secret_id)
+        self._value = json.loads(response["SecretString"])
+        self._fetched_at = self.clock()
+        self._store_file()
+
+    def _load_file(self):
+        if not self.cache_file:
+            return False
+        try:
+            with open(self.cache_file) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if cached.get("secret_id") != self.secret_id or self.clock() - cached.get("fetched_at", 0) >= self.ttl:
+            return False
+        self._value = cached["value"]
+        self._fetched_at = cached["fetched_at"]
+        return True
+
+    def _store_file(self):
+        if not self.cache_file:
+            return
+        tmp = f"{self.cache_file}.{os.getpid()}"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"secret_id": self.secret_id, "fetched_at": self._fetched_at, "value": self._value}, f)
+        os.replace(tmp, self.cache_file)
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                with self._lock:
+                    self._fetch()
+            except Exception as e:
+                # Keep serving the cached value; the next read after expiry retries in the foreground
+                print(f"Secret refresh failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=refresh, name="secret-refresh", daemon=True).start()
+
+
+def is_auth_failure(error) -> bool:
+    # psycopg2 reports rejected credentials as OperationalError without a pgcode on connect
+    message = str(error).lower()
+    return "password authentication failed" in message or "28p01" in message or "authentication failed" in message
@@ -1,14 +1,15 @@
 import os
-import json
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import boto3
+from .credentials import CachedSecret, is_auth_failure
+
+SECRETS_MANAGER_ARN = os.getenv("SECRETS_MANAGER_ARN")
+db_secret = CachedSecret(SECRETS_MANAGER_ARN) if SECRETS_MANAGER_ARN else None
 
 
 def get_db_secret():
-    secret_arn = os.getenv("SECRETS_MANAGER_ARN")
-    if not secret_arn:
+    if db_secret is None:
         return {
             "username": os.getenv("DB_USER", "formuser"),
             "password": os.getenv("DB_PASSWORD", ""),
@@ -16,15 +17,52 @@ def get_db_secret():
             "port": os.getenv("DB_PORT", "5432"),
             "dbname": os.getenv("DB_NAME", "formdb")
         }
-    client = boto3.client('secretsmanager', region_name=os.getenv("AWS_REGION", "us-east-2"))
-    response = client.get_secret_value(SecretId=secret_arn)
-    return json.loads(response['SecretString'])
+    return db_secret.get()
+
+def connect_params(secret):
+    return {
+        "user": secret["username"],
+        "password": secret["password"],
+        "host": secret["host"],
+        "port": int(secret["port"]),
+        "dbname": secret["dbname"],
+    }
 
 def get_db_url():
     secret = get_db_secret()
     return f"postgresql+psycopg2://{secret['username']}:{secret['password']}@{secret['host']}:{secret['port']}/{secret['dbname']}"
 
-SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", get_db_url())
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Lambda runs one request per container at a time: keep one warm connection, ping it
+# after idle periods, and recycle it before RDS or a NAT gateway drops it
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "1")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "1")),
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "5")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "300")),
+    "pool_pre_ping": True,
+    "connect_args": {"keepalives": 1, "keepalives_idle": 30, "keepalives_interval": 10, "keepalives_count": 5},
+}
+
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+if SQLALCHEMY_DATABASE_URL:
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, **POOL_OPTIONS)
+else:
+    # Credentials are resolved per new connection (see below), so importing this module
+    # makes no Secrets Manager call and a rotated secret reaches warm containers.
+    engine = create_engine("postgresql+psycopg2://", **POOL_OPTIONS)
+
+    @event.listens_for(engine, "do_connect")
+    def connect_with_current_secret(dialect, conn_rec, cargs, cparams):
+        cparams.update(connect_params(get_db_secret()))
+        try:
+            return dialect.connect(*cargs, **cparams)
+        except dialect.loaded_dbapi.OperationalError as e:
+            if db_secret is None or not is_auth_failure(e):
+                raise
+            # The password was probably rotated: drop the cached copy and retry once
+            db_secret.invalidate()
+            cparams.update(connect_params(get_db_secret()))
+            return dialect.connect(*cargs, **cparams)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base() 
\ No newline at end of file
+Base = declarative_base()